@@ -0,0 +1,67 @@
+"""
+Rebuild a document of div and span pairs several times and report what is left for the cyclic garbage collector
+after a reset, along with the collector's pause times during the rebuilds.
+
+Needs the `sublime` and `mdpopups` modules to be importable, e.g. run it from the Sublime Text console with
+`exec(open("/path/to/benchmarks/gc_pauses.py").read())`, or with a stand-in for both on PYTHONPATH:
+
+    python benchmarks/gc_pauses.py
+"""
+
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "st4"))
+
+from vision import Vision  # noqa: E402
+from vision.context import Context  # noqa: E402
+
+ELEMENTS = 20000
+REBUILDS = 10
+
+
+def main():
+    ctx = Context()
+    document = Vision(ctx)
+
+    def build():
+        with document:
+            with ctx.body():
+                for i in range(ELEMENTS):
+                    with ctx.div():
+                        ctx.span(str(i))
+
+    gc.collect()
+    gc.disable()
+    try:
+        build()
+        document.render()
+        document.reset()
+        print(f"objects only the cyclic GC frees after reset: {gc.collect()}")
+    finally:
+        gc.enable()
+
+    pauses = []
+    started = [0.0]
+
+    def measure(phase, info):
+        if phase == "start":
+            started[0] = time.perf_counter()
+        else:
+            pauses.append(time.perf_counter() - started[0])
+
+    gc.callbacks.append(measure)
+    try:
+        for _ in range(REBUILDS):
+            document.reset()
+            build()
+            document.render()
+    finally:
+        gc.callbacks.remove(measure)
+    print(f"gc pauses: {len(pauses)}, max {max(pauses) * 1000:.1f} ms, total {sum(pauses) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Render documents embedding several large images as data URIs and report the render time and the memory the render
+allocates at its peak and retains.
+
+Needs the `sublime` and `mdpopups` modules to be importable, e.g. run it from the Sublime Text console with
+`exec(open("/path/to/benchmarks/large_images.py").read())`, or with a stand-in for both on PYTHONPATH:
+
+    python benchmarks/large_images.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "st4"))
+
+from vision import Vision  # noqa: E402
+from vision.context import Context  # noqa: E402
+from vision.images import ImageType  # noqa: E402
+from vision.memory import traced_allocations  # noqa: E402
+from vision.ui import Image  # noqa: E402
+
+IMAGES = 5
+IMAGE_MIB = 3
+REPEAT = 3
+
+MIB = 1024 * 1024
+
+
+def build(uris):
+    ctx = Context()
+    document = Vision(ctx)
+    with document:
+        with ctx.body():
+            for i, uri in enumerate(uris):
+                with ctx.div():
+                    with ctx.div():
+                        ctx.p(f"image {i}")
+                        Image(ctx, uri, image_type=ImageType.Base64, alt=f"image {i}")
+    return document
+
+
+def main():
+    uris = [f"data:image/png;base64,{chr(ord('A') + i) * (IMAGE_MIB * MIB)}" for i in range(IMAGES)]
+    # Data URIs are resolved without the loader threads, so only the render is measured
+    documents = [build(uris) for _ in range(REPEAT)]
+    timings = []
+    usages = []
+    for document in documents:
+        with traced_allocations() as usage:
+            start = time.perf_counter()
+            html = document.render()
+            timings.append(time.perf_counter() - start)
+        usages.append(usage)
+    best = min(range(REPEAT), key=lambda i: timings[i])
+    print(f"{IMAGES} images of {IMAGE_MIB} MiB, output {len(html) / MIB:.1f} MiB")
+    print(f"render     {timings[best] * 1000:8.1f} ms")
+    print(f"peak       {usages[best]['peak'] / MIB:8.1f} MiB")
+    print(f"retained   {usages[best]['retained'] / MIB:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
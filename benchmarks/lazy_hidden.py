@@ -0,0 +1,55 @@
+"""
+Build and render panels of which 90% are hidden, once with `when(False)` and once with `Lazy`.
+
+Needs the `sublime` and `mdpopups` modules to be importable, e.g. run it from the Sublime Text console with
+`exec(open("/path/to/benchmarks/lazy_hidden.py").read())`, or with a stand-in for both on PYTHONPATH:
+
+    python benchmarks/lazy_hidden.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "st4"))
+
+from vision import Vision  # noqa: E402
+from vision.context import Context  # noqa: E402
+
+PANELS = 2000
+ROWS = 10
+REPEAT = 5
+
+
+def build(lazy: bool):
+    ctx = Context()
+    document = Vision(ctx)
+    start = time.perf_counter()
+    with document:
+        with ctx.body():
+            for i in range(PANELS):
+
+                def panel(i=i):
+                    with ctx.div().set_classes("append", "panel").set_style("padding", "4px"):
+                        for j in range(ROWS):
+                            ctx.p(f"row {i} {j}").set_style("color", "red")
+
+                shown = i % 10 == 0
+                if lazy:
+                    ctx.lazy(shown, panel)
+                else:
+                    with ctx.div().when(shown):
+                        panel()
+    html = document.render()
+    return time.perf_counter() - start, document.memory_usage().node_count, html
+
+
+def main():
+    for name, lazy in (("when(False)", False), ("Lazy", True)):
+        runs = [build(lazy) for _ in range(REPEAT)]
+        elapsed = min(run[0] for run in runs)
+        print(f"{name:12} {elapsed * 1000:8.1f} ms {runs[0][1]:8} live nodes {len(runs[0][2]):8} bytes")
+
+
+if __name__ == "__main__":
+    main()
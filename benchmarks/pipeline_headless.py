@@ -0,0 +1,99 @@
+"""
+Drive a RenderPipeline with list-based schedulers and check that requests coalesce, superseded frames are dropped
+and frames matching the shown content are neither rendered nor pushed. Nothing touches a real sheet, the published
+HTML is collected in a list.
+
+Needs the `sublime` and `mdpopups` modules to be importable, e.g. run it from the Sublime Text console with
+`exec(open("/path/to/benchmarks/pipeline_headless.py").read())`, or with a stand-in for both on PYTHONPATH:
+
+    python benchmarks/pipeline_headless.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "st4"))
+
+from vision.pipeline import PipelineStats, RenderPipeline  # noqa: E402
+
+
+class _Sheet:
+    """Stands in for an open HTML sheet."""
+
+    def window(self):
+        return self
+
+
+def run(queue):
+    while queue:
+        queue.pop(0)()
+
+
+def main():
+    async_jobs = []
+    main_jobs = []
+    built = []
+    shown = []
+
+    def build(ctx, text, supersede_with=None):
+        built.append(text)
+        with ctx.body():
+            ctx.p(text)
+        if supersede_with is not None:
+            pipeline.request(supersede_with)
+
+    pipeline = RenderPipeline("Pipeline", build, run_async=async_jobs.append, run_main=main_jobs.append)
+    pipeline.vision.sheets = [_Sheet()]
+    pipeline.vision.publish = lambda html, windows=None: shown.append(html)
+
+    # Requests made before the worker runs coalesce into one build of the newest
+    for text in ("one", "two", "three"):
+        pipeline.request(text)
+    assert len(async_jobs) == 1, async_jobs
+    run(async_jobs)
+    assert built == ["three"], built
+    run(main_jobs)
+    assert len(shown) == 1 and "three" in shown[-1], shown
+    assert pipeline.stats() == PipelineStats(requested=3, rendered=1, published=1, unchanged=0, dropped=2)
+
+    # A frame superseded while its publish is queued on the main thread is not shown
+    pipeline.request("four")
+    run(async_jobs)
+    pipeline.request("five")
+    run(main_jobs)
+    assert len(shown) == 1, shown
+    run(async_jobs)
+    run(main_jobs)
+    assert "five" in shown[-1], shown
+
+    # A frame superseded while it is being built is not rendered
+    rendered = pipeline.stats().rendered
+    pipeline.request("six", supersede_with="seven")
+    run(async_jobs)
+    assert built[-2:] == ["six", "seven"], built
+    assert pipeline.stats().rendered == rendered + 1
+    run(main_jobs)
+    assert "seven" in shown[-1] and not any("six" in html for html in shown), shown
+
+    # A frame with the content already shown is neither rendered nor pushed
+    stats = pipeline.stats()
+    pipeline.request("seven")
+    run(async_jobs)
+    assert not main_jobs, main_jobs
+    assert pipeline.stats().unchanged == stats.unchanged + 1
+    assert pipeline.stats().rendered == stats.rendered
+
+    # Frames still queued on the main thread are discarded once the pipeline is disposed
+    pipeline.request("eight")
+    run(async_jobs)
+    pipeline.dispose()
+    count = len(shown)
+    run(main_jobs)
+    assert len(shown) == count, shown
+
+    print(pipeline.stats())
+    print("pipeline ok")
+
+
+if __name__ == "__main__":
+    main()
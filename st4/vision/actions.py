@@ -0,0 +1,186 @@
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+import sublime_plugin
+
+ACTION_COMMAND = "vision_action"
+ACTION_PREFIX = f"subl:{ACTION_COMMAND} "
+
+
+class _Entry:
+    __slots__ = ("resolve", "owner", "generation", "key")
+
+    def __init__(self, resolve: Callable[[], Optional[Callable]], owner: int, generation: int, key: Hashable):
+        self.resolve = resolve
+        self.owner = owner
+        self.generation = generation
+        self.key = key
+
+
+def _strong(callback: Callable) -> Callable[[], Optional[Callable]]:
+    return lambda: callback
+
+
+class _Owner:
+    __slots__ = ("ref", "generation", "ids")
+
+    def __init__(self, ref: weakref.ref):
+        self.ref = ref
+        self.generation = 0
+        self.ids: Set[str] = set()
+
+
+class ActionScope:
+    """
+    Owns the actions of a fragment rendered outside any document, such as a cached popup or component. The
+    actions stay registered as long as the scope is referenced, which `Fragment` markup does.
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+class ActionRegistry:
+    """
+    Maps compact ids to Python callbacks so interactive sheets can link to `subl:vision_action {"id": "1f"}`
+    instead of encoding their state into command URLs. Clicks are dispatched with a single dict lookup.
+
+    Bound methods are held through weak references. Other callables are held until their owning document
+    is re-rendered without registering them again, is disposed or garbage collected, or its sheet is closed.
+    Registering the same callback again for the same document returns the same id, so unchanged links keep
+    identical markup across rebuilds.
+
+    The `VisionActionCommand` below must be imported into a top level plugin module so Sublime Text
+    registers the `vision_action` command.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[str, _Entry] = {}
+        self._keys: Dict[Hashable, str] = {}
+        self._owners: Dict[int, _Owner] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _owner(self, owner: Any) -> _Owner:
+        owner_id = id(owner)
+        state = self._owners.get(owner_id)
+        if state is None:
+            state = _Owner(weakref.ref(owner, lambda _, owner_id=owner_id: self._forget(owner_id)))
+            self._owners[owner_id] = state
+        return state
+
+    def register(self, callback: Callable[[], Any], owner: Any) -> str:
+        """Register callback for the owner document and return its id."""
+        if not callable(callback):
+            raise TypeError("callback must be callable")
+        with self._lock:
+            state = self._owner(owner)
+            resolve: Callable[[], Optional[Callable]]
+            if hasattr(callback, "__self__") and hasattr(callback, "__func__"):
+                key: Hashable = (id(owner), id(callback.__self__), id(callback.__func__))  # type: ignore
+                resolve = weakref.WeakMethod(callback)  # type: ignore
+            else:
+                key = (id(owner), id(callback))
+                resolve = _strong(callback)
+            action_id = self._keys.get(key)
+            entry = self._entries.get(action_id) if action_id is not None else None
+            if entry is not None and entry.resolve() is not None:
+                entry.generation = state.generation
+                return action_id  # type: ignore
+            action_id = format(self._next_id, "x")
+            self._next_id += 1
+            self._entries[action_id] = _Entry(resolve, id(owner), state.generation, key)
+            self._keys[key] = action_id
+            state.ids.add(action_id)
+            return action_id
+
+    def href(self, callback: Callable[[], Any], owner: Any) -> str:
+        return f'{ACTION_PREFIX}{{"id": "{self.register(callback, owner)}"}}'
+
+    def dispatch(self, action_id: str) -> bool:
+        """Run the callback registered under action_id. Returns False when the id is unknown or stale."""
+        entry = self._entries.get(action_id)
+        callback = entry.resolve() if entry is not None else None
+        if callback is None:
+            if entry is not None:
+                with self._lock:
+                    self._remove(action_id)
+            return False
+        callback()
+        return True
+
+    def _remove(self, action_id: str):
+        entry = self._entries.pop(action_id, None)
+        if entry is None:
+            return
+        if self._keys.get(entry.key) == action_id:
+            del self._keys[entry.key]
+        state = self._owners.get(entry.owner)
+        if state is not None:
+            state.ids.discard(action_id)
+
+    def _forget(self, owner_id: int):
+        with self._lock:
+            state = self._owners.pop(owner_id, None)
+            if state is not None:
+                for action_id in list(state.ids):
+                    self._remove(action_id)
+
+    def transfer(self, source: Any, target: Any) -> bool:
+        """Hand every action registered for source over to target. Returns False when source has none."""
+        with self._lock:
+            state = self._owners.pop(id(source), None)
+            if state is None or not state.ids:
+                return False
+            target_state = self._owner(target)
+            for action_id in state.ids:
+                entry = self._entries[action_id]
+                if self._keys.get(entry.key) == action_id:
+                    del self._keys[entry.key]
+                entry.key = (id(target), *entry.key[1:])  # type: ignore
+                entry.owner = id(target)
+                entry.generation = target_state.generation
+                self._keys[entry.key] = action_id
+                target_state.ids.add(action_id)
+            return True
+
+    def begin_generation(self, owner: Any):
+        """Called when the owner starts a rebuild, ids not registered again before evict_stale are dropped."""
+        with self._lock:
+            state = self._owners.get(id(owner))
+            if state is not None:
+                state.generation += 1
+            self.prune()
+
+    def evict_stale(self, owner: Any):
+        with self._lock:
+            state = self._owners.get(id(owner))
+            if state is None or not state.ids:
+                return
+            for action_id in [i for i in state.ids if self._entries[i].generation < state.generation]:
+                self._remove(action_id)
+
+    def evict_owner(self, owner: Any):
+        self._forget(id(owner))
+
+    def prune(self):
+        """Drop every entry of documents whose sheets have all been closed."""
+        with self._lock:
+            for owner_id, state in list(self._owners.items()):
+                owner = state.ref()
+                sheets = getattr(owner, "sheets", None)
+                if owner is None or (sheets and all(sheet.window() is None for sheet in sheets)):
+                    self._forget(owner_id)
+
+
+actions = ActionRegistry()
+
+
+class VisionActionCommand(sublime_plugin.WindowCommand):
+    """Dispatches clicks on links created through the action registry."""
+
+    def run(self, id: str):
+        actions.dispatch(id)
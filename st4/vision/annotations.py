@@ -0,0 +1,211 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Set, Tuple
+
+import sublime
+
+from .component import render_fragment
+from .trace import span
+from .types import ContextBase
+
+
+class Annotation(NamedTuple):
+    """
+    A region annotated with a fragment. Annotations sharing a key share one rendered fragment, so the
+    builder only runs for the first annotation with each key.
+
+    Attributes:
+        region (sublime.Region): The annotated region.
+        key (Hashable): Identifies the fragment content, e.g. ("error", message).
+        builder (Callable): Called with the context to build the fragment on a cache miss.
+    """
+
+    region: sublime.Region
+    key: Hashable
+    builder: Callable[[ContextBase], Any]
+
+
+class AnnotationStyle(NamedTuple):
+    """
+    How a group of annotations is drawn, see `sublime.View.add_regions`.
+
+    Attributes:
+        scope (str): Scope used to color the regions.
+        icon (str): Gutter icon name or resource path.
+        flags (int): Combination of `sublime.DRAW_*` flags.
+        annotation_color (str): CSS color of the annotation block, empty for the scope color.
+    """
+
+    scope: str = ""
+    icon: str = ""
+    flags: int = 0
+    annotation_color: str = ""
+
+
+class AnnotationStats(NamedTuple):
+    """
+    Attributes:
+        groups (int): Annotation groups currently drawn.
+        annotations (int): Annotations currently drawn.
+        fragments (int): Distinct fragment keys currently referenced.
+        unique_html (int): Distinct HTML strings among those fragments.
+        renders (int): Fragments built and rendered since the target was created.
+        add_regions (int): Calls made to `add_regions`.
+        skipped (int): Group updates skipped because nothing changed.
+    """
+
+    groups: int
+    annotations: int
+    fragments: int
+    unique_html: int
+    renders: int
+    add_regions: int
+    skipped: int
+
+
+class AnnotationTarget:
+    """
+    Draws large batches of keyed fragments as region annotations of a view. Each distinct fragment key is
+    built and rendered once and identical HTML is shared between keys, so thousands of annotations built
+    from a few messages cost a few renders. Every group is drawn with a single `add_regions` call under the
+    key `<name>.<group>`, and a group whose regions, fragments and style are unchanged is not redrawn.
+
+    Attributes:
+        view (sublime.View): The view to annotate.
+        name (str): Prefix of the region keys, distinguishing several targets on one view.
+
+    Example usage:
+        target = AnnotationTarget(ctx, view, "lint")
+        target.update({
+            "error": [Annotation(region, ("error", msg), error_fragment(msg)) for region, msg in errors],
+            "warning": [Annotation(region, ("warning", msg), warning_fragment(msg)) for region, msg in warnings],
+        }, styles={"error": AnnotationStyle("region.redish", "circle")})
+    """
+
+    def __init__(
+        self,
+        ctx: ContextBase,
+        view: sublime.View,
+        name: str = "vision",
+        on_navigate: Optional[Callable[[str], Any]] = None,
+    ):
+        self.ctx = ctx
+        self.view = view
+        self.name = name
+        self.on_navigate = on_navigate
+        self._lock = threading.RLock()
+        # fragment key -> rendered HTML, interned so equal HTML is one object
+        self._fragments: Dict[Hashable, str] = {}
+        self._interned: Dict[str, str] = {}
+        # group -> (region spans, fragment keys, style) as last drawn
+        self._drawn: Dict[str, Tuple[Tuple[Tuple[int, int], ...], Tuple[Hashable, ...], AnnotationStyle]] = {}
+        self._dirty: Set[str] = set()
+        self._renders = 0
+        self._add_regions = 0
+        self._skipped = 0
+
+    def region_key(self, group: str) -> str:
+        return f"{self.name}.{group}"
+
+    def _html_for(self, annotation: Annotation) -> str:
+        html = self._fragments.get(annotation.key)
+        if html is None:
+            html = render_fragment(self.ctx, annotation.builder)
+            html = self._interned.setdefault(html, html)
+            self._fragments[annotation.key] = html
+            self._renders += 1
+        return html
+
+    def _prune(self):
+        """Forget fragments no drawn group refers to anymore."""
+        live = {key for _, keys, _ in self._drawn.values() for key in keys}
+        self._fragments = {key: html for key, html in self._fragments.items() if key in live}
+        self._interned = {html: html for html in self._fragments.values()}
+
+    def set_group(self, group: str, annotations: Iterable[Annotation], style: AnnotationStyle = AnnotationStyle()):
+        """Draw the annotations of one group, replacing what the group showed before."""
+        with self._lock:
+            if self._draw(group, annotations, style):
+                self._prune()
+
+    def _draw(self, group: str, annotations: Iterable[Annotation], style: AnnotationStyle) -> bool:
+        annotations = list(annotations)
+        with span(self.ctx, "annotations", args={"group": group, "count": len(annotations)}):
+            spans = tuple((annotation.region.a, annotation.region.b) for annotation in annotations)
+            keys = tuple(annotation.key for annotation in annotations)
+            drawn = self._drawn.get(group)
+            if drawn is not None and group not in self._dirty and drawn == (spans, keys, style):
+                self._skipped += 1
+                return False
+            html = [self._html_for(annotation) for annotation in annotations]
+            self._drawn[group] = (spans, keys, style)
+            self._dirty.discard(group)
+            self._add_regions += 1
+            self.view.add_regions(
+                self.region_key(group),
+                [annotation.region for annotation in annotations],
+                scope=style.scope,
+                icon=style.icon,
+                flags=style.flags,
+                annotations=html,
+                annotation_color=style.annotation_color,
+                on_navigate=self.on_navigate,
+            )
+            return True
+
+    def remove_group(self, group: str):
+        with self._lock:
+            if self._erase(group):
+                self._prune()
+
+    def _erase(self, group: str) -> bool:
+        if self._drawn.pop(group, None) is None:
+            return False
+        self._dirty.discard(group)
+        self.view.erase_regions(self.region_key(group))
+        return True
+
+    def update(
+        self,
+        groups: Dict[str, Iterable[Annotation]],
+        styles: Optional[Dict[str, AnnotationStyle]] = None,
+    ):
+        """
+        Draw a full batch of groups. Groups missing from the batch are erased and unchanged groups are left
+        as they are, so updating after a lint run only touches the groups whose annotations changed.
+        """
+        styles = styles or {}
+        with self._lock:
+            changed = False
+            for group in [group for group in self._drawn if group not in groups]:
+                changed = self._erase(group) or changed
+            for group, annotations in groups.items():
+                changed = self._draw(group, annotations, styles.get(group, AnnotationStyle())) or changed
+            if changed:
+                self._prune()
+
+    def invalidate(self, key: Hashable):
+        """Render the fragment of key again, redrawing the groups using it on their next update."""
+        with self._lock:
+            if self._fragments.pop(key, None) is None:
+                return
+            for group, (_, keys, _) in self._drawn.items():
+                if key in keys:
+                    self._dirty.add(group)
+
+    def clear(self):
+        with self._lock:
+            for group in list(self._drawn):
+                self._erase(group)
+            self._prune()
+
+    def stats(self) -> AnnotationStats:
+        with self._lock:
+            return AnnotationStats(
+                len(self._drawn),
+                sum(len(keys) for _, keys, _ in self._drawn.values()),
+                len(self._fragments),
+                len(self._interned),
+                self._renders,
+                self._add_regions,
+                self._skipped,
+            )
@@ -0,0 +1,198 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from .actions import ActionScope, actions
+from .tag import tag
+from .text import Text
+from .types import ContextBase
+
+
+class CacheInfo(NamedTuple):
+    """
+    Hit/miss statistics for a memoized component, modelled after `functools.lru_cache`.
+
+    Attributes:
+        hits (int): Number of calls served from the cache.
+        misses (int): Number of calls that built and rendered the component.
+        evictions (int): Entries dropped because the cache exceeded maxsize.
+        expirations (int): Entries dropped because they outlived the ttl.
+        maxsize (Optional[int]): Upper bound on cached fragments, None for unbounded.
+        currsize (int): Number of fragments currently cached.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+class FragmentCache:
+    """
+    A thread safe LRU cache of rendered HTML fragments with an optional time to live.
+
+    Attributes:
+        maxsize (Optional[int]): Upper bound on cached fragments, None for unbounded.
+        ttl (Optional[float]): Seconds a fragment stays valid, None to never expire.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 128, ttl: Optional[float] = None):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("maxsize must be None or a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            fragment, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return fragment
+
+    def put(self, key: Hashable, fragment: str):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = (fragment, time.monotonic())
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every fragment whose key matches predicate, returns how many were dropped."""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._expirations = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self._expirations,
+                self.maxsize,
+                len(self._entries),
+            )
+
+
+def _make_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    key = (args, tuple(sorted(kwargs.items()))) if kwargs else (args,)
+    try:
+        hash(key)
+    except TypeError as e:
+        raise TypeError(f"Component arguments must be hashable: {e}") from None
+    return key
+
+
+class Fragment(str):
+    """
+    Markup rendered by `render_fragment`. Links created with `on_click` while building it are owned by its
+    `action_scope`, so they keep working for as long as the markup is referenced, e.g. by a cache entry, a
+    visible popup or the `Text` node showing it in a document.
+    """
+
+    action_scope: Optional[ActionScope] = None
+
+
+class _FragmentContainer(tag):
+    _owns_actions = True
+
+
+def render_fragment(ctx: ContextBase, builder: Callable[..., Any], *args, **kwargs) -> Fragment:
+    """
+    Run builder inside a detached container and return the HTML of everything it attached.
+    The container is never linked into the current tree, so the caller decides where the markup goes.
+    """
+    container = _FragmentContainer(None, "fragment")
+    container.ctx = ctx
+    with container:
+        builder(ctx, *args, **kwargs)
+    fragment = Fragment("".join(child.render() for child in container._children if child is not None))
+    scope = ActionScope()
+    if actions.transfer(container, scope):
+        # The container is dropped right away, the markup carries the callbacks its links point to
+        fragment.action_scope = scope
+    return fragment
+
+
+def component(maxsize: Optional[int] = 128, ttl: Optional[float] = None):
+    """
+    Decorator that memoizes the rendered fragment of a component. The component is any callable taking
+    the context as its first argument, either a function building tags or a tag subclass such as the
+    widgets in `ui.py`. The remaining arguments form the cache key and must be hashable.
+
+    On a hit, the cached markup is spliced into the current parent as a single pre-rendered `Text` node
+    and the component is not called at all. On a miss, the component is built in a detached container,
+    rendered once, cached and spliced the same way. Either way the inserted `Text` node is returned.
+
+    Example usage:
+        @component(maxsize=256, ttl=30)
+        def status_row(ctx, label, count):
+            with ctx.div().set_classes("append", "row"):
+                ctx.span(label)
+                ctx.span(str(count))
+
+        status_row(ctx, "errors", 3)
+        status_row.cache_info()
+        status_row.invalidate("errors", 3)
+    """
+
+    def decorator(builder: Callable[..., Any]):
+        cache = FragmentCache(maxsize, ttl)
+
+        @functools.wraps(builder)
+        def wrapper(ctx: ContextBase, *args, **kwargs) -> Text:
+            key = _make_key(args, kwargs)
+            fragment = cache.get(key)
+            if fragment is None:
+                fragment = render_fragment(ctx, builder, *args, **kwargs)
+                cache.put(key, fragment)
+            return Text(ctx, fragment)
+
+        def invalidate(*args, **kwargs) -> bool:
+            """Drop the cached fragment for the given arguments, returns True if one was cached."""
+            return cache.invalidate(_make_key(args, kwargs))
+
+        wrapper.invalidate = invalidate  # type: ignore
+        wrapper.cache_clear = cache.clear  # type: ignore
+        wrapper.cache_info = cache.info  # type: ignore
+        wrapper.cache = cache  # type: ignore
+        return wrapper
+
+    return decorator
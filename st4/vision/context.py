@@ -1,5 +1,5 @@
 import threading
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from .a import a
 from .b import b
@@ -20,15 +20,18 @@ from .hr import hr
 from .html import html
 from .i import i
 from .img import img
+from .lazy import Lazy
 from .li import li
 from .ol import ol
 from .p import p
+from .pool import DEFAULT_MAX_PER_CLASS, NodePool, PoolStats
 from .renderable import BaseTag
 from .small import small
 from .span import span
 from .strong import strong
 from .style import style
 from .tag import tag
+from .trace import DEFAULT_CAPACITY, Tracer
 from .text import Text as text
 from .tt import tt
 from .types import ContextBase
@@ -41,6 +44,8 @@ class Context(ContextBase):
     def __init__(self):
         self.current: Any = None
         self._lock = threading.RLock()
+        self.pool = NodePool()
+        self.tracer: Optional[Tracer] = None
 
     def push(self, instance):
         with self._lock:
@@ -54,6 +59,32 @@ class Context(ContextBase):
         with self._lock:
             self.current = instance.parent
 
+    def enable_pooling(self, enabled: bool = True, max_per_class: int = DEFAULT_MAX_PER_CLASS):
+        """
+        Turn node recycling on or off. While on, `Vision.reset` returns the old tree to per-class free lists
+        and new nodes are taken from them.
+        """
+        with self._lock:
+            self.pool.enabled = enabled
+            self.pool.max_per_class = max_per_class
+            if not enabled:
+                self.pool.clear()
+
+    def pool_stats(self) -> PoolStats:
+        return self.pool.stats()
+
+    def enable_tracing(self, capacity: int = DEFAULT_CAPACITY) -> Tracer:
+        """Start recording spans of this context into a new ring buffer and return its tracer."""
+        with self._lock:
+            self.tracer = Tracer(capacity)
+            return self.tracer
+
+    def disable_tracing(self) -> Optional[Tracer]:
+        """Stop recording and return the tracer, whose events can still be exported."""
+        with self._lock:
+            tracer, self.tracer = self.tracer, None
+            return tracer
+
     def a(self, href: Optional[str], content: Optional[str] = None, *args, **kwargs) -> BaseTag:
         return a(self, href, content, *args, **kwargs)
 
@@ -111,6 +142,11 @@ class Context(ContextBase):
     def img(self, src: Optional[str], *args, **kwargs) -> BaseTag:
         return img(self, src, *args, **kwargs)
 
+    def lazy(
+        self, condition: Any, then: Callable[[], Any], otherwise: Optional[Callable[[], Any]] = None, *args, **kwargs
+    ) -> BaseTag:
+        return Lazy(self, condition, then, otherwise, *args, **kwargs)
+
     def li(self, content: Optional[str] = None, *args, **kwargs) -> BaseTag:
         return li(self, content, *args, **kwargs)
 
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+try:
+    import sqlite3
+except ImportError:  # pragma: no cover - some embedded interpreters ship without sqlite
+    sqlite3 = None
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragments (
+    key TEXT PRIMARY KEY,
+    html TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fragments_accessed ON fragments (accessed);
+"""
+
+
+def content_key(*parts: str) -> str:
+    """Hash the inputs of a render into a stable cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FragmentStore:
+    """
+    A cache of rendered HTML fragments keyed by content hash, persisted in a local SQLite database so
+    expensive renders such as highlighted `CodeBlock`s survive editor restarts.
+
+    The database runs in WAL mode with a busy timeout, so the 3.3 and 3.8 plugin hosts can share one
+    file. Entries are evicted least recently used first once the stored HTML exceeds max_bytes. Reads
+    never write: access times are collected in memory and written along with the next insert. When no
+    path is given, sqlite3 is unavailable, or the database can't be opened or fails later, e.g. because
+    the other plugin host held the write lock past the timeout, the store falls back to an in-memory
+    LRU with the same interface.
+
+    Attributes:
+        path (Optional[str]): Location of the database file, None for in-memory mode.
+        max_bytes (int): Upper bound on the total size of cached HTML.
+
+    Example usage:
+        store = FragmentStore(os.path.join(sublime.cache_path(), "Vision", "fragments.db"))
+        html = store.get_or_render(content_key(code, scheme), lambda: mdpopups.md2html(view, code))
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES, timeout: float = 5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._db = None
+        # Access times of entries read since the last write, and the size of the stored HTML
+        self._accessed: Dict[str, float] = {}
+        self._db_bytes = 0
+        if path is not None and sqlite3 is not None:
+            try:
+                self._db = self._connect(path, timeout)
+                self._db_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+            except (sqlite3.Error, OSError):
+                self._db = None
+
+    @staticmethod
+    def _connect(path: str, timeout: float):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def _degrade(self):
+        # The database failed, keep serving from memory rather than breaking the render asking for a fragment
+        db, self._db = self._db, None
+        self._accessed.clear()
+        try:
+            db.close()
+        except sqlite3.Error:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT html FROM fragments WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    self._degrade()
+                else:
+                    if row is None:
+                        return None
+                    self._accessed[key] = time.time()
+                    return row[0]
+            html = self._memory.get(key)
+            if html is not None:
+                self._memory.move_to_end(key)
+            return html
+
+    def put(self, key: str, html: str):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._put_db(key, html, size)
+                    return
+                except sqlite3.Error:
+                    self._degrade()
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous.encode("utf-8"))
+            self._memory[key] = html
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.encode("utf-8"))
+
+    def _put_db(self, key: str, html: str, size: int):
+        # BEGIN IMMEDIATE takes the write lock up front, so a concurrent plugin host waits on the
+        # busy timeout instead of failing half way through the eviction.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            previous = self._db.execute("SELECT size FROM fragments WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO fragments (key, html, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, html, size, time.time()),
+            )
+            if self._accessed:
+                self._db.executemany(
+                    "UPDATE fragments SET accessed = ? WHERE key = ?",
+                    [(accessed, accessed_key) for accessed_key, accessed in self._accessed.items()],
+                )
+            total = self._db_bytes + size - (previous[0] if previous is not None else 0)
+            if total > self.max_bytes:
+                total = self._evict()
+            self._db.execute("COMMIT")
+        except BaseException:
+            try:
+                self._db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            raise
+        self._accessed.clear()
+        self._db_bytes = total
+
+    def _evict(self) -> int:
+        # The running total misses what the other plugin host stored, count for real before evicting
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+        if total <= self.max_bytes:
+            return total
+        rows = self._db.execute("SELECT key, size FROM fragments ORDER BY accessed ASC")
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM fragments WHERE key = ?", stale)
+        return total
+
+    def get_or_render(self, key: str, render: Callable[[], str]) -> str:
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.put(key, html)
+        return html
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT size FROM fragments WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        self._db.execute("DELETE FROM fragments WHERE key = ?", (key,))
+                        self._db_bytes -= row[0]
+                    self._accessed.pop(key, None)
+                except sqlite3.Error:
+                    self._degrade()
+            html = self._memory.pop(key, None)
+            if html is not None:
+                self._memory_bytes -= len(html.encode("utf-8"))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM fragments")
+                    self._db_bytes = 0
+                    self._accessed.clear()
+                except sqlite3.Error:
+                    self._degrade()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                if self._accessed:
+                    try:
+                        self._db.executemany(
+                            "UPDATE fragments SET accessed = ? WHERE key = ?",
+                            [(accessed, key) for key, accessed in self._accessed.items()],
+                        )
+                    except sqlite3.Error:
+                        pass
+                    self._accessed.clear()
+                self._db.close()
+                self._db = None
@@ -0,0 +1,159 @@
+import html
+import re
+import threading
+import traceback
+import uuid
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import mdpopups
+import sublime
+
+from .scopestyle import scheme_of, scope_styles
+
+RE_FENCE = re.compile(r"^[ \t]*(`{3,}|~{3,})[ \t]*\{?\.?([\w+#.-]*)", re.MULTILINE)
+# Constructs whose meaning depends on the rest of the document, such as reference links and footnotes
+RE_DOCUMENT_SCOPED = re.compile(r"^ {0,3}\[[^\]]+\]:|^\[TOC\]|^\*\[[^\]]+\]:", re.MULTILINE)
+# Frontmatter, only read as such at the start of a document
+RE_FRONTMATTER = re.compile(r"\A\s*-{3}[ \t]*$", re.MULTILINE)
+
+# Keys of snippets being highlighted in the background and the callbacks waiting for them
+_inflight: Dict[Hashable, List[Callable[[str], Any]]] = {}
+_inflight_lock = threading.Lock()
+
+
+def fence_language(source: str) -> str:
+    """Language of the first fenced block of a Markdown snippet, empty when it has none or no info string."""
+    match = RE_FENCE.search(source)
+    return match.group(2).lower() if match else ""
+
+
+def _batchable(source: str) -> bool:
+    # Unbalanced fences or document scoped definitions would leak into the neighbouring snippets, and
+    # frontmatter would turn into text anywhere but first
+    return (
+        len(RE_FENCE.findall(source)) % 2 == 0
+        and RE_DOCUMENT_SCOPED.search(source) is None
+        and RE_FRONTMATTER.match(source) is None
+    )
+
+
+def highlight(view: Optional[sublime.View], source: str) -> str:
+    return mdpopups.md2html(view, source, md=True)
+
+
+def highlight_batch(view: Optional[sublime.View], sources: List[str]) -> List[str]:
+    """
+    Convert several Markdown snippets with a single `md2html` call and split the result back per snippet, so the
+    Markdown and highlighter setup is paid once. Snippets are separated by a paragraph holding a random token.
+    Snippets that could affect their neighbours are converted on their own, and if the token paragraphs don't
+    split the output into exactly one piece per snippet, every snippet is converted separately instead.
+    """
+    batchable = [index for index, source in enumerate(sources) if _batchable(source)]
+    results: List[Optional[str]] = [None] * len(sources)
+    if len(batchable) > 1:
+        token = f"vision{uuid.uuid4().hex}"
+        combined = f"\n\n{token}\n\n".join(sources[index] for index in batchable)
+        pieces = highlight(view, combined).split(f"\n<p>{token}</p>\n")
+        if len(pieces) == len(batchable):
+            for index, piece in zip(batchable, pieces):
+                results[index] = piece
+    return [highlight(view, source) if result is None else result for source, result in zip(sources, results)]
+
+
+def _code_html(text: str) -> str:
+    # minihtml collapses whitespace inside <pre> too, so spaces and line breaks are spelled out like mdpopups does
+    return html.escape(text, quote=False).replace(" ", "&nbsp;").replace("\n", "<br>")
+
+
+def placeholder(source: str) -> str:
+    """Unhighlighted stand-in for a snippet: its code, escaped, in a plain pre block."""
+    lines = source.strip("\n").split("\n")
+    if len(lines) >= 2 and RE_FENCE.match(lines[0]) and RE_FENCE.match(lines[-1]):
+        lines = lines[1:-1]
+    code = _code_html("\n".join(lines))
+    return f'<div class="highlight"><pre>{code}</pre></div>'
+
+
+def highlight_scopes(view: sublime.View, region: sublime.Region) -> str:
+    """
+    Highlight a region of an open view from the scope tokens the view already computed, without converting any
+    Markdown. Every token becomes a span styled from the shared `scope_styles` cache, and neighbouring tokens
+    of the same style share a span. The region's text is read in one call.
+    """
+    scheme = scheme_of(view)
+    begin, end = region.begin(), region.end()
+    text = view.substr(region)
+    parts: List[str] = []
+    run_style, run_start, run_end = "", 0, 0
+
+    def flush(until: int):
+        if until > run_start:
+            code = _code_html(text[run_start:until])
+            parts.append(f'<span style="{run_style}">{code}</span>' if run_style else code)
+
+    for token, scope in view.extract_tokens_with_scopes(region):
+        start, stop = max(token.begin(), begin) - begin, min(token.end(), end) - begin
+        if stop <= start:
+            continue
+        if start > run_end and run_style:
+            # Text between tokens is shown unstyled
+            flush(run_end)
+            run_style, run_start = "", run_end
+        style = scope_styles.inline(view, scope, scheme)
+        if style != run_style:
+            flush(start)
+            run_style, run_start = style, start
+        run_end = stop
+    if run_end < len(text) and run_style:
+        flush(run_end)
+        run_style, run_start = "", run_end
+    flush(len(text))
+    return f'<div class="highlight"><pre>{"".join(parts)}</pre></div>'
+
+
+def highlight_async(
+    view: Optional[sublime.View],
+    jobs: List[Tuple[Hashable, str, Callable[[str], Any]]],
+    run_async: Optional[Callable[[Callable[[], Any]], Any]] = None,
+):
+    """
+    Highlight snippets in the background, batched like `highlight_batch`. Each job is a key identifying the
+    result, the snippet and a callback receiving the highlighted markup on the worker thread. A job whose key is
+    already being highlighted waits for that result instead of highlighting the snippet again. `run_async`
+    schedules the work, `sublime.set_timeout_async` by default.
+    """
+    # The waiter list is kept with each key, the key may be registered again by a later job once it's handed out
+    fresh: List[Tuple[Hashable, str, List[Callable[[str], Any]]]] = []
+    with _inflight_lock:
+        for key, source, done in jobs:
+            waiters = _inflight.get(key)
+            if waiters is not None:
+                waiters.append(done)
+            else:
+                waiters = _inflight[key] = [done]
+                fresh.append((key, source, waiters))
+    if not fresh:
+        return
+
+    def release(key: Hashable, waiters: List[Callable[[str], Any]]):
+        with _inflight_lock:
+            if _inflight.get(key) is waiters:
+                del _inflight[key]
+
+    def work():
+        try:
+            results = highlight_batch(view, [source for _, source, _ in fresh])
+            for (key, _, waiters), markup in zip(fresh, results):
+                release(key, waiters)
+                for done in waiters:
+                    # One failing waiter must not keep the others from their result
+                    try:
+                        done(markup)
+                    except Exception:
+                        traceback.print_exc()
+        finally:
+            # A snippet that failed to highlight can be requested again
+            for key, _, waiters in fresh:
+                release(key, waiters)
+
+    (run_async or sublime.set_timeout_async)(work)
@@ -0,0 +1,114 @@
+import base64
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from typing import Optional, Tuple
+
+import sublime
+
+from .trace import NULL_SPAN, Tracer
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAXSIZE = 256
+
+
+class ImageType(Enum):
+    """
+    An enumeration to represent different types of image formats supported.
+
+    Attributes:
+        PNG (int): Represents an image in Portable Network Graphics format.
+        JPEG (int): Represents an image in Joint Photographic Experts Group format.
+        Base64 (int): Indicates that the image is encoded in Base64 format, usually for embedding directly into web pages.
+    """
+
+    PNG = 1
+    JPEG = 2
+    Base64 = 3
+
+
+def _image_to_base64(path: str, image_type: ImageType = ImageType.PNG) -> str:
+    data = sublime.load_binary_resource(path)
+    if image_type == ImageType.PNG:
+        return f'data:image/png;base64,{base64.b64encode(data).decode("ascii")}'
+    elif image_type == ImageType.JPEG:
+        return f'data:image/jpeg;base64,{base64.b64encode(data).decode("ascii")}'
+    elif image_type == ImageType.Base64:
+        return path
+    else:
+        raise ValueError("Invalid image type")
+
+
+def _failed(future: Future) -> bool:
+    # A resource read before its package was loaded fails, later requests try again
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+def _load(path: str, image_type: ImageType, tracer: Optional[Tracer]) -> str:
+    # Recorded on the loader thread, the render only waits for the result
+    with tracer.span("encode_image", "image", {"src": path}) if tracer is not None else NULL_SPAN:
+        return _image_to_base64(path, image_type)
+
+
+class ImageLoader:
+    """
+    Loads package resources and encodes them as data URIs on a thread pool. Each (path, type) is loaded once
+    and kept in an LRU of encoded URIs, so documents showing the same icons share one string. Failed loads
+    are not kept, the next request loads the resource again. `Image` and `Icon` request their source at build
+    time and only wait for it when they are rendered.
+
+    Attributes:
+        max_workers (int): Threads loading and encoding resources.
+        maxsize (int): Number of encoded images kept.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, maxsize: int = DEFAULT_MAXSIZE):
+        self.max_workers = max_workers
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._entries: "OrderedDict[Tuple[str, ImageType], Future]" = OrderedDict()
+
+    def prefetch(self, path: str, image_type: ImageType = ImageType.PNG, tracer: Optional[Tracer] = None) -> Future:
+        """
+        Start loading the image unless it is loaded or loading, and return the future of its data URI. The load
+        is recorded in the given tracer.
+        """
+        key = (path, image_type)
+        with self._lock:
+            future = self._entries.get(key)
+            if future is not None and not _failed(future):
+                self._entries.move_to_end(key)
+                return future
+            if image_type == ImageType.Base64:
+                future = Future()
+                future.set_result(path)
+            else:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="vision-images")
+                future = self._executor.submit(_load, path, image_type, tracer)
+            self._entries[key] = future
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return future
+
+    def invalidate(self, path: str, image_type: ImageType = ImageType.PNG):
+        """Forget the encoded image, the next request loads the resource again."""
+        with self._lock:
+            self._entries.pop((path, image_type), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self):
+        """Stop the worker threads, e.g. from `plugin_unloaded`. They are started again on the next request."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._entries.clear()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+images = ImageLoader()
@@ -0,0 +1,137 @@
+from typing import Any, Callable, List, Optional, Union
+
+from .renderable import BaseTag
+from .rope import Rope, join
+from .style import style
+from .tag import SelfClosingTag, tag
+from .text import Text
+from .trace import span
+from .types import ContextBase
+
+_THEN = 1
+_ELSE = 0
+
+
+class Lazy(BaseTag):
+    """
+    A conditional subtree that is only built when it is rendered and its condition holds. Unlike `when(False)`,
+    which still constructs, validates and keeps the hidden elements, a hidden `Lazy` costs one node and one
+    condition check. `when_or_else` is the eager counterpart of passing both builders.
+
+    The condition is a value or a callable evaluated at render time. Builders take no arguments and add
+    elements to the current context just like code inside `with` blocks does. The built branch is kept until
+    the condition changes, which needs a rebuild or a call to `refresh()` to be noticed, like any other change.
+
+    A `Vision` builds the shown branches before it reconciles and batches its elements, so elements of a lazy
+    branch reuse their previous render under `reconcile=True` and `CodeBlock`s in it are highlighted together
+    with the rest. The `Lazy` itself is not reused, its builders are new closures on every rebuild, so it joins
+    the output of its children again.
+
+    Attributes:
+        condition (Any): Value or callable deciding which branch is shown.
+        then (Callable): Builds the subtree shown when the condition is truthy.
+        otherwise (Optional[Callable]): Builds the subtree shown when it is falsy, nothing by default.
+
+    Example usage:
+        with ctx.body():
+            Lazy(ctx, lambda: settings.get("show_details"), lambda: build_details(ctx))
+            ctx.lazy(expanded, lambda: ctx.p(long_text), lambda: ctx.p("..."))
+    """
+
+    def __init__(
+        self,
+        ctx: ContextBase,
+        condition: Any,
+        then: Callable[[], Any],
+        otherwise: Optional[Callable[[], Any]] = None,
+        key: Optional[Any] = None,
+    ):
+        super().__init__(ctx, "", key=key)
+        self._condition = condition
+        self._then = then
+        self._otherwise = otherwise
+        self._branch: Optional[int] = None
+        self._children: List[BaseTag] = []
+
+    def child(self, *elems):
+        raise TypeError("Lazy subtrees are built by their builders and cannot adopt children.")
+
+    def _evaluate(self) -> int:
+        condition = self._condition() if callable(self._condition) else self._condition
+        return _THEN if condition else _ELSE
+
+    def _build(self) -> List[BaseTag]:
+        """Build the branch selected by the condition, unless it is the one already built."""
+        branch = self._evaluate()
+        if branch == self._branch:
+            return self._children
+        ctx = self.ctx
+        with ctx._lock:  # type: ignore
+            pool = getattr(ctx, "pool", None)
+            if pool is not None and pool.enabled:
+                for node in self._children:
+                    pool.release(node)
+            self._children = []
+            self._branch = branch
+            builder = self._then if branch == _THEN else self._otherwise
+            if builder is not None:
+                previous, ctx.current = ctx.current, self  # type: ignore
+                try:
+                    with span(ctx, "lazy_build"):
+                        builder()
+                finally:
+                    ctx.current = previous  # type: ignore
+            self._invalidate()
+        return self._children
+
+    def refresh(self) -> "Lazy":
+        """Evaluate the condition and build the selected branch again on the next render."""
+        self._branch = None
+        self._invalidate()
+        return self
+
+    # Query Methods
+    def query_by_id(self, id_value: str) -> Optional[tag]:
+        """Query the built branch for an element with a specific id, a branch that wasn't built has no elements."""
+        with self.ctx._lock:  # type: ignore
+            for child in self._children:
+                if isinstance(child, (style, Text, SelfClosingTag)):
+                    continue
+                result = child.query_by_id(id_value)
+                if result is not None:
+                    return result
+            return None
+
+    def query_by_class(self, class_value: str) -> List[tag]:
+        """Query the built branch for elements with a specific class."""
+        results = []
+        for child in self._children:
+            if isinstance(child, (tag, Lazy)):
+                results.extend(child.query_by_class(class_value))
+        return results
+
+    def content_digest(self) -> bytes:
+        if self._digest is None and self._should_render:
+            self._build()
+        return super().content_digest()
+
+    def render(self) -> str:
+        output = self.render_rope()
+        return output if isinstance(output, str) else str(output)
+
+    def render_rope(self) -> Union[str, Rope]:
+        if self._html is not None:
+            return self._html
+        if self._should_render is False:
+            self._html = ""
+            return ""
+        parts: List[Union[str, Rope]] = []
+        for child in self._build():
+            if child is None:
+                continue
+            if isinstance(child, tag) and type(child).render is tag.render:
+                parts.append(child.render_rope())
+            else:
+                parts.append(child.render())
+        self._html = join(parts)
+        return self._html
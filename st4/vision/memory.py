@@ -0,0 +1,148 @@
+import gc
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Set
+
+
+class MemoryReport(NamedTuple):
+    """
+    Retained memory of an element subtree in bytes, broken down by category. Objects shared between
+    elements, such as interned style names, are counted once.
+
+    Attributes:
+        node_count (int): Number of elements in the subtree.
+        nodes (int): The element objects, their instance dicts, children and class lists.
+        styles (int): Inline style dicts and the rules of `style` elements.
+        attributes (int): Attribute dicts and values, except embedded images.
+        content (int): Content strings, including highlighted `CodeBlock` markup.
+        cached_renders (int): Cached HTML strings and ropes.
+        images (int): `data:` URIs embedded by `Image` and `Icon`.
+    """
+
+    node_count: int
+    nodes: int
+    styles: int
+    attributes: int
+    content: int
+    cached_renders: int
+    images: int
+
+    @property
+    def total(self) -> int:
+        return self.nodes + self.styles + self.attributes + self.content + self.cached_renders + self.images
+
+    def __str__(self) -> str:
+        rows = [(name, getattr(self, name)) for name in self._fields if name != "node_count"]
+        lines = [f"{self.node_count} nodes, {_format_bytes(self.total)} retained"]
+        lines.extend(f"  {name:<15}{_format_bytes(size):>12}" for name, size in rows)
+        return "\n".join(lines)
+
+
+def _format_bytes(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+class _Sizer:
+    def __init__(self, precise: bool):
+        self.precise = precise
+        self.seen: Set[int] = set()
+
+    def size(self, obj: Any) -> int:
+        """Size of obj and, in precise mode, of every container and string it references."""
+        if obj is None or id(obj) in self.seen:
+            return 0
+        if not self.precise:
+            self.seen.add(id(obj))
+            return sys.getsizeof(obj)
+        total = 0
+        pending = [obj]
+        while pending:
+            current = pending.pop()
+            if id(current) in self.seen or isinstance(current, type) or hasattr(current, "_invalidate"):
+                # Elements are accounted for separately, classes are shared by every instance
+                continue
+            self.seen.add(id(current))
+            total += sys.getsizeof(current)
+            pending.extend(gc.get_referents(current))
+        return total
+
+    def mapping(self, value: Dict[Any, Any]) -> int:
+        if self.precise:
+            return self.size(value)
+        return self.size(value) + sum(self.size(k) + self.size(v) for k, v in value.items())
+
+
+def measure(node: Any, precise: bool = False) -> MemoryReport:
+    """
+    Walk a subtree and report its retained memory. The default mode sizes each field with sys.getsizeof,
+    precise mode follows every referenced container and string as well, which is slower but also counts
+    dict internals, tuples and nested style rules.
+    """
+    sizer = _Sizer(precise)
+    counts = dict(node_count=0, nodes=0, styles=0, attributes=0, content=0, cached_renders=0, images=0)
+    stack: List[Any] = [node]
+    while stack:
+        current = stack.pop()
+        if current is None or id(current) in sizer.seen:
+            continue
+        sizer.seen.add(id(current))
+        state = current.__dict__
+        children = state.get("_children", ())
+        counts["node_count"] += 1
+        counts["nodes"] += sys.getsizeof(current) + sys.getsizeof(state)
+        counts["nodes"] += sizer.size(state.get("_classes")) + sizer.size(children if children else None)
+        if "sheet" in state and hasattr(state["sheet"], "rules"):
+            counts["styles"] += sizer.size(state["sheet"])
+            counts["styles"] += sum(sizer.mapping(rule) for rule in state["sheet"]._rules.values())
+        counts["styles"] += sizer.mapping(state.get("_styles", {}))
+        for key, value in state.get("_attributes", {}).items():
+            if isinstance(value, str) and value.startswith("data:"):
+                counts["images"] += sizer.size(value)
+            else:
+                counts["attributes"] += sizer.size(key) + sizer.size(value)
+        counts["attributes"] += sizer.size(state.get("_attributes"))
+        counts["images"] += sizer.size(state.get("_src_uri"))
+        counts["content"] += sizer.size(state.get("_content") or None)
+        cached = state.get("_html")
+        if cached is not None and not isinstance(cached, str):
+            counts["cached_renders"] += sizer.size(cached) + sizer.size(cached.parts) + sizer.size(cached._flat)
+        else:
+            counts["cached_renders"] += sizer.size(cached or None)
+        stack.extend(children)
+    return MemoryReport(**counts)
+
+
+@contextmanager
+def traced_allocations() -> Iterator[Dict[str, int]]:
+    """
+    Measure with tracemalloc what a block of code allocates and still retains when it exits, e.g. building
+    or rendering a document in a headless benchmark. Existing objects can't be attributed after the fact,
+    so wrap the code that creates them.
+
+    Example usage:
+        with traced_allocations() as usage:
+            build(ctx, vision)
+            vision.render()
+        print(usage["retained"], usage["peak"])
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    usage = {"retained": 0, "peak": 0}
+    # Without reset_peak (Python < 3.9) the peak includes allocations made before the block
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    try:
+        yield usage
+    finally:
+        after, peak = tracemalloc.get_traced_memory()
+        usage["retained"] = after - before
+        usage["peak"] = max(peak - before, 0)
+        if started:
+            tracemalloc.stop()
@@ -0,0 +1,155 @@
+import threading
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+import sublime
+
+from .context import Context
+from .trace import span
+from .vision import Vision
+
+Scheduler = Callable[[Callable[[], Any]], Any]
+
+
+class PipelineStats(NamedTuple):
+    """
+    Attributes:
+        requested (int): Frames requested.
+        rendered (int): Frames built and rendered on the worker.
+        published (int): Frames pushed to the sheet on the main thread.
+        unchanged (int): Built frames whose content matched the sheet, so they were neither rendered nor pushed.
+        dropped (int): Frames superseded by a newer request before they reached the sheet.
+    """
+
+    requested: int
+    rendered: int
+    published: int
+    unchanged: int
+    dropped: int
+
+
+class RenderPipeline:
+    """
+    Builds and renders a Vision document on a worker thread and only marshals the finished HTML to the main
+    thread for `update_html_sheet`. The document lives in a Context of its own, so building never contends
+    with the lock of the live context, and it is reconciled with the previous frame by default.
+
+    Requests coalesce: the worker always builds the newest request, and a frame that is superseded while it
+    is being built or while its publish is queued on the main thread is dropped instead of shown.
+
+    Attributes:
+        sheet_name (str): Name of the sheet the frames are shown in.
+        build (Callable): Called on the worker as `build(ctx, *args, **kwargs)` inside `with vision:`.
+        ctx (Context): The worker's context, e.g. to enable tracing or pooling.
+        vision (Vision): The document the frames are built into.
+
+    Example usage:
+        def build(ctx, results):
+            with ctx.body():
+                for result in results:
+                    ctx.p(result)
+
+        pipeline = RenderPipeline("Results", build)
+        pipeline.request(results)  # returns immediately, the sheet updates once the frame is rendered
+    """
+
+    def __init__(
+        self,
+        sheet_name: str,
+        build: Callable[..., Any],
+        reconcile: bool = True,
+        run_async: Scheduler = sublime.set_timeout_async,
+        run_main: Scheduler = sublime.set_timeout,
+    ):
+        if sheet_name == "":
+            raise ValueError("Sheet name cannot be empty")
+        self.sheet_name = sheet_name
+        self.build = build
+        self.ctx = Context()
+        self.vision = Vision(self.ctx, reconcile=reconcile)
+        self.vision.sheet_name = sheet_name
+        self._run_async = run_async
+        self._run_main = run_main
+        self._lock = threading.Lock()
+        self._pending: Optional[Tuple[int, tuple, dict]] = None
+        self._working = False
+        self._latest = 0
+        self._cancelled = 0
+        self._rendered = 0
+        self._published = 0
+        self._unchanged = 0
+        self._dropped = 0
+
+    def request(self, *args, **kwargs) -> int:
+        """Queue a frame built from the given arguments and return its number. Safe to call from any thread."""
+        with self._lock:
+            self._latest += 1
+            if self._pending is not None:
+                self._dropped += 1
+            self._pending = (self._latest, args, kwargs)
+            frame = self._latest
+            if self._working:
+                return frame
+            self._working = True
+        self._run_async(self._work)
+        return frame
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._working = False
+                    return
+                frame, args, kwargs = self._pending
+                self._pending = None
+            try:
+                self._render_frame(frame, args, kwargs)
+            except BaseException:
+                with self._lock:
+                    self._working = False
+                    if self._pending is not None:
+                        self._working = True
+                        self._run_async(self._work)
+                raise
+
+    def _render_frame(self, frame: int, args: tuple, kwargs: dict):
+        vision = self.vision
+        with span(self.ctx, "frame", "pipeline", {"frame": frame}):
+            vision.reset()
+            with vision:
+                self.build(self.ctx, *args, **kwargs)
+            with self._lock:
+                if self._pending is not None:
+                    # A newer frame arrived while building, don't spend a render on this one
+                    self._dropped += 1
+                    return
+            digest = vision.content_digest()
+            if digest == vision._sheet_digest and vision.live_sheets():
+                with self._lock:
+                    self._unchanged += 1
+                return
+            html = vision.render()
+            with self._lock:
+                self._rendered += 1
+        self._run_main(lambda: self._publish(frame, html, digest))
+
+    def _publish(self, frame: int, html: str, digest: bytes):
+        with self._lock:
+            if frame != self._latest or frame <= self._cancelled:
+                self._dropped += 1
+                return
+            self._published += 1
+        self.vision.last_html = html
+        self.vision._sheet_digest = digest
+        self.vision.publish(html)
+
+    def stats(self) -> PipelineStats:
+        with self._lock:
+            return PipelineStats(self._latest, self._rendered, self._published, self._unchanged, self._dropped)
+
+    def dispose(self):
+        """Drop pending frames and tear the document down. Frames already queued on the main thread are discarded."""
+        with self._lock:
+            self._pending = None
+            self._cancelled = self._latest
+        with self.ctx._lock:
+            self.vision.dispose()
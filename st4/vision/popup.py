@@ -0,0 +1,181 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Set, Tuple, Union
+
+import mdpopups
+import sublime
+import sublime_plugin
+
+from .component import CacheInfo, FragmentCache, render_fragment
+from .trace import span
+from .types import ContextBase
+
+PopupKey = Tuple[int, int, Tuple[int, int], Hashable]
+
+
+class PopupStats(NamedTuple):
+    """
+    Statistics of a PopupCache.
+
+    Attributes:
+        cache (CacheInfo): Hits and misses of the rendered HTML lookups.
+        shown (int): Popups opened with `mdpopups.show_popup`.
+        updated (int): Visible popups refreshed in place with `mdpopups.update_popup`.
+        unchanged (int): Requests for a visible popup that already showed the same HTML.
+        invalidations (int): Fragments dropped because their buffer was modified or closed.
+    """
+
+    cache: CacheInfo
+    shown: int
+    updated: int
+    unchanged: int
+    invalidations: int
+
+
+def _span_of(region: Union[sublime.Region, int]) -> Tuple[int, int]:
+    if isinstance(region, int):
+        return (region, region)
+    return (region.a, region.b)
+
+
+class PopupCache:
+    """
+    Renders Vision fragments into hover popups and caches the HTML by view id, change count, region and a
+    fragment key chosen by the caller. Hovering the same symbol again while the buffer is unchanged costs a
+    dict lookup, and a popup that is already visible at that location is refreshed with `update_popup`
+    instead of being closed and reopened, or left alone when its HTML is the same.
+
+    Entries of a view are dropped as soon as its buffer is modified or it closes. This needs the
+    `VisionPopupListener` below to be imported into a top level plugin module.
+
+    Attributes:
+        maxsize (Optional[int]): Upper bound on cached fragments, None for unbounded.
+
+    Example usage:
+        def hover(ctx):
+            with ctx.div().set_classes("append", "hover"):
+                ctx.code(symbol)
+                ctx.p(docs)
+
+        popups.show(ctx, view, point, ("docs", symbol), hover, max_width=600)
+    """
+
+    def __init__(self, maxsize: Optional[int] = 256):
+        self.maxsize = maxsize
+        self._fragments = FragmentCache(maxsize)
+        self._lock = threading.RLock()
+        self._views: Set[int] = set()
+        # view id -> (location, html) of the popup this cache last put on screen
+        self._visible: Dict[int, Tuple[int, str]] = {}
+        self._shown = 0
+        self._updated = 0
+        self._unchanged = 0
+        self._invalidations = 0
+
+    def key(self, view: sublime.View, region: Union[sublime.Region, int], fragment_key: Hashable) -> PopupKey:
+        return (view.id(), view.change_count(), _span_of(region), fragment_key)
+
+    def render(
+        self,
+        ctx: ContextBase,
+        view: sublime.View,
+        region: Union[sublime.Region, int],
+        fragment_key: Hashable,
+        builder: Callable[[ContextBase], Any],
+    ) -> str:
+        """Return the cached popup HTML for this view state, building and rendering it on a miss."""
+        key = self.key(view, region, fragment_key)
+        html = self._fragments.get(key)
+        if html is None:
+            with span(ctx, "popup_render", args={"key": str(fragment_key)}):
+                html = render_fragment(ctx, builder)
+            with self._lock:
+                self._fragments.put(key, html)
+                self._views.add(key[0])
+        return html
+
+    def show(
+        self,
+        ctx: ContextBase,
+        view: sublime.View,
+        region: Union[sublime.Region, int],
+        fragment_key: Hashable,
+        builder: Callable[[ContextBase], Any],
+        location: int = -1,
+        on_hide: Optional[Callable[[], Any]] = None,
+        **options,
+    ) -> str:
+        """
+        Show the fragment in a popup at location, which defaults to the start of region. Remaining keyword
+        arguments are passed to `mdpopups.show_popup`. Returns the popup HTML.
+        """
+        html = self.render(ctx, view, region, fragment_key, builder)
+        if location < 0:
+            location = min(_span_of(region))
+        view_id = view.id()
+        with self._lock:
+            visible = self._visible.get(view_id) if mdpopups.is_popup_visible(view) else None
+            if visible is not None and visible[0] == location:
+                if visible[1] == html:
+                    self._unchanged += 1
+                    return html
+                self._visible[view_id] = (location, html)
+                self._updated += 1
+                with span(ctx, "update_popup", "popup", {"bytes": len(html)}):
+                    mdpopups.update_popup(view, html, md=False)
+                return html
+            self._visible[view_id] = (location, html)
+            self._shown += 1
+
+        def hidden():
+            with self._lock:
+                if self._visible.get(view_id, (None,))[0] == location:
+                    del self._visible[view_id]
+            if on_hide is not None:
+                on_hide()
+
+        with span(ctx, "show_popup", "popup", {"bytes": len(html)}):
+            mdpopups.show_popup(view, html, md=False, location=location, on_hide=hidden, **options)
+        return html
+
+    def invalidate_view(self, view_id: int) -> int:
+        """Drop every fragment cached for the view, returns how many were dropped."""
+        with self._lock:
+            if view_id not in self._views:
+                return 0
+            self._views.discard(view_id)
+            dropped = self._fragments.invalidate_where(lambda key: key[0] == view_id)  # type: ignore
+            self._invalidations += dropped
+            return dropped
+
+    def forget_view(self, view_id: int):
+        """Drop the fragments and the popup state of a closed view."""
+        with self._lock:
+            self.invalidate_view(view_id)
+            self._visible.pop(view_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._views.clear()
+            self._visible.clear()
+            self._shown = 0
+            self._updated = 0
+            self._unchanged = 0
+            self._invalidations = 0
+
+    def stats(self) -> PopupStats:
+        with self._lock:
+            return PopupStats(self._fragments.info(), self._shown, self._updated, self._unchanged, self._invalidations)
+
+
+popups = PopupCache()
+
+
+class VisionPopupListener(sublime_plugin.EventListener):
+    """Drops cached popups of a view when its buffer changes or it closes."""
+
+    def on_modified(self, view: sublime.View):
+        popups.invalidate_view(view.id())
+
+    def on_close(self, view: sublime.View):
+        popups.forget_view(view.id())
@@ -0,0 +1,74 @@
+from typing import Any, Dict, Hashable, List, Sequence
+
+# Attributes that place a node in a tree or identify it, rather than describe what it renders
+_NON_INPUTS = frozenset(["ctx", "_parent_ref", "_children", "_previous_current", "key"])
+_MISSING = object()
+
+
+def _same_inputs(old: Any, new: Any) -> bool:
+    old_state = old.__dict__
+    skip = new._render_state
+    for k, v in new.__dict__.items():
+        if k in _NON_INPUTS or k in skip:
+            continue
+        if old_state.get(k, _MISSING) != v:
+            return False
+    return True
+
+
+def _adopt(old: Any, new: Any):
+    for attr in new._render_state:
+        if attr in old.__dict__:
+            new.__dict__[attr] = old.__dict__[attr]
+
+
+def reconcile_node(old: Any, new: Any) -> bool:
+    """
+    Compare a rebuilt node with its previous counterpart. When the node and its whole subtree are unchanged,
+    the new node takes over the render state (cached HTML and anything listed in `_render_state`) of the old
+    one and True is returned. Unchanged descendants of a changed node still take over their state.
+    """
+    if type(old) is not type(new):
+        return False
+    same = _same_inputs(old, new)
+    old_children = old.__dict__.get("_children")
+    new_children = new.__dict__.get("_children")
+    if old_children is not None and new_children is not None:
+        same = reconcile(old_children, new_children) and same
+    if same:
+        _adopt(old, new)
+    return same
+
+
+def reconcile(old_children: Sequence[Any], new_children: Sequence[Any]) -> bool:
+    """
+    Match two lists of siblings, keyed children by key and the others by their position among unkeyed
+    siblings. Every child is matched at most once through a dict lookup or a cursor, so reordering a
+    keyed list costs O(n). Returns True when the new list renders exactly like the old one.
+    """
+    old_list: List[Any] = [child for child in old_children if child is not None]
+    new_list: List[Any] = [child for child in new_children if child is not None]
+    keyed: Dict[Hashable, Any] = {}
+    unkeyed: List[Any] = []
+    for child in old_list:
+        if child.key is not None:
+            keyed[child.key] = child
+        else:
+            unkeyed.append(child)
+
+    same = len(old_list) == len(new_list)
+    cursor = 0
+    for index, new in enumerate(new_list):
+        if new.key is not None:
+            old = keyed.pop(new.key, None)
+        elif cursor < len(unkeyed):
+            old = unkeyed[cursor]
+            cursor += 1
+        else:
+            old = None
+        if old is None or not reconcile_node(old, new):
+            same = False
+        elif index >= len(old_list) or old is not old_list[index]:
+            # Reused, but moved, so the parent's markup differs
+            same = False
+    return same
@@ -1,7 +1,12 @@
+import hashlib
 import html
-from typing import Any, Callable, Dict, List, Literal, Optional, Union
+import weakref
+from typing import Any, Callable, Dict, Hashable, List, Literal, Optional, Tuple, Union
 
+from .actions import actions
+from .memory import MemoryReport, measure
 from .supported import attribute_validator, css_validator
+from .trace import span
 from .types import ContextBase
 
 
@@ -17,7 +22,13 @@ class base(type):
     """
 
     def __call__(cls, *args, **kwargs):
-        instance = super().__call__(*args, **kwargs)
+        ctx = args[0] if args else kwargs.get("ctx")
+        pool = getattr(ctx, "pool", None)
+        instance = pool.acquire(cls) if pool is not None else None
+        if instance is None:
+            instance = super().__call__(*args, **kwargs)
+        else:
+            instance.__init__(*args, **kwargs)
         # test
         if instance.ctx is None:
             return instance
@@ -26,6 +37,8 @@ class base(type):
             instance.parent = instance.ctx.current
             if instance.ctx.current is not None:
                 instance.ctx.current._children.append(instance)
+                instance.ctx.current._invalidate()
+                instance.ctx.tree_version += 1
         return instance
 
 
@@ -38,18 +51,40 @@ class BaseTag(metaclass=base):
         tag (str): The type of HTML tag (e.g., 'div', 'span', 'img').
         id (Optional[str]): The HTML 'id' attribute for the element (default None).
         classes (Optional[List[str]]): CSS classes to apply to the element.
+        key (Optional[Hashable]): Identity of the element among its siblings, used to match rebuilt trees.
 
     Note:
         - Use the __enter__ and __exit__ methods to manage context and enable nesting.
         - This class uses a metaclass for instance creation control and parent-child relationship management.
+        - The last rendered HTML is cached on the element. Every mutator invalidates the cache of the element
+          and its ancestors, so direct changes to private fields must call _invalidate() themselves.
+        - Parents own their children, children only hold a weak reference to their parent. A discarded tree
+          has no reference cycles and is freed by reference counting without waiting for the cyclic GC.
     """
 
+    # Cached output of the last render, None when the element or one of its descendants changed since.
+    # Large elements cache a Rope of their children's output instead of a string.
+    _html: Optional[Any] = None
+    # Merkle digest of the element's content and its children's digests, None when stale
+    _digest: Optional[bytes] = None
+    # Attributes produced by rendering rather than by building, carried over when a rebuilt tree is reconciled
+    _render_state: Tuple[str, ...] = ("_html", "_digest", "_provided")
+    # Callable producing the content at render time, its escaping function and its cached result
+    _provider: Optional[Callable[[], Any]] = None
+    _provider_escape: Optional[Callable[[str], str]] = None
+    _provided: Optional[str] = None
+    # Set by classes whose elements are prepared together through prepare_render before a document renders
+    _batch_render: bool = False
+    # Set on containers of detached fragments, which own the callbacks of the links built inside them
+    _owns_actions: bool = False
+
     def __init__(
         self,
         ctx: Optional[ContextBase] = None,
         tag: str = "",
         id: Optional[str] = None,
         classes: Union[List[str], None] = None,
+        key: Optional[Hashable] = None,
     ) -> None:
         self.ctx = ctx
         self.tag: str = tag
@@ -58,7 +93,123 @@ class BaseTag(metaclass=base):
         self._styles: Dict[Any, Any] = {}
         self._attributes: Dict[str, str] = {}
         self._should_render: bool = True
-        self.parent = None
+        self._parent_ref: Optional[weakref.ref] = None
+        if key is not None:
+            try:
+                hash(key)
+            except TypeError:
+                raise TypeError(f"Key {key!r} is not hashable, use a tuple instead of a list.") from None
+        self.key = key
+        self._html = None
+        self._digest = None
+
+    @property
+    def parent(self) -> Any:
+        ref = self.__dict__.get("_parent_ref")
+        return ref() if ref is not None else None
+
+    @parent.setter
+    def parent(self, value: Any):
+        self._parent_ref = weakref.ref(value) if value is not None else None
+
+    def _invalidate(self):
+        """
+        Drop the cached render and digest of this element and its ancestors. An uncached element never has a
+        cached ancestor, so the walk stops at the first one that is already invalid.
+        """
+        if self._provider is not None:
+            self._provided = None
+        node = self
+        while node is not None and (node._html is not None or node._digest is not None):
+            node._html = None
+            node._digest = None
+            node = node.parent
+
+    @classmethod
+    def prepare_render(cls, nodes: List["BaseTag"]):
+        """
+        Called by `Vision.render` with every shown element of a class setting `_batch_render`, before anything is
+        rendered, so work such as syntax highlighting can be done for all of them at once.
+        """
+
+    @classmethod
+    def revalidate(cls, nodes: List["BaseTag"]):
+        """
+        Called with the same elements by `Vision.render_to_sheet` before comparing the document's digest to the
+        one last pushed, and by `Vision.render` after reconciling. Elements whose output depends on state outside
+        the tree, such as the color scheme, invalidate themselves here when that state changed, so neither the
+        digest check nor cached HTML taken over from the previous tree hides the change.
+        """
+
+    def _resolved_content(self) -> str:
+        """The content of the element, running its content provider if the last result was invalidated."""
+        if self._provider is None:
+            return self.__dict__.get("_content", "")
+        if self._provided is None:
+            with span(self.ctx, "content_provider", args={"tag": self.tag}):
+                value = self._provider()
+            value = "" if value is None else str(value)
+            self._provided = self._provider_escape(value) if self._provider_escape is not None else value
+        return self._provided
+
+    # Content Hashing
+    def _hash_parts(self) -> Tuple[Any, ...]:
+        """Inputs of subclasses that render from their own fields rather than from content and children."""
+        return ()
+
+    def content_digest(self) -> bytes:
+        """
+        Return a 16 byte digest of the element's tag, id, classes, styles, attributes, content and the digests of
+        its children. Styles and attributes are hashed in sorted order, so elements that differ only in the order
+        their styles were set hash the same. Digests are cached and only recomputed along invalidated paths.
+        Hidden elements render nothing, their content and children are left out so providers and lazy branches
+        under them are not run.
+        """
+        if self._digest is not None:
+            return self._digest
+        if "_content" in self._render_state or not self._should_render:
+            own_content = ""
+        else:
+            own_content = self._resolved_content()
+        fields = [
+            self.tag,
+            self.id or "",
+            " ".join(self._classes),
+            ";".join(f"{key}:{value}" for key, value in sorted(self._styles.items())),
+            ";".join(f"{key}={value}" for key, value in sorted(self._attributes.items())),
+            "1" if self._should_render else "0",
+            own_content,
+        ]
+        fields.extend(str(part) for part in self._hash_parts())
+        digest = hashlib.blake2b(digest_size=16)
+        for field in fields:
+            data = field.encode("utf-8")
+            digest.update(len(data).to_bytes(4, "big"))
+            digest.update(data)
+        if self._should_render:
+            for child in self.__dict__.get("_children", ()):
+                if child is not None:
+                    digest.update(child.content_digest())
+        self._digest = digest.digest()
+        return self._digest
+
+    def content_hash(self) -> str:
+        """Hex form of content_digest, usable as a cache key for fragments shared across documents."""
+        return self.content_digest().hex()
+
+    def same_content(self, other: "BaseTag") -> bool:
+        return self.content_digest() == other.content_digest()
+
+    # Memory Accounting
+    def memory_usage(self, precise: bool = False) -> MemoryReport:
+        """
+        Report the memory retained by this element and its descendants, split into nodes, styles, attributes,
+        content, cached renders and embedded image data. Printing the report gives a readable breakdown.
+        """
+        if self.ctx:
+            with self.ctx._lock:  # type: ignore
+                return measure(self, precise)
+        return measure(self, precise)
 
     # Ensure all chaining methods return 'self' and are available in all relevant classes
     def __enter__(self) -> "BaseTag":
@@ -93,16 +244,25 @@ class BaseTag(metaclass=base):
         if self.ctx:
             with self.ctx._lock:  # type: ignore
                 self._styles.update(style_dict)
+                self._invalidate()
         else:
             self._styles.update(style_dict)
+            self._invalidate()
 
     def set_style(self, key: str, value: str) -> "BaseTag | ValueError":
-        css_validator.validate(key, value)
+        tracer = getattr(self.ctx, "tracer", None)
+        if tracer is None:
+            css_validator.validate(key, value)
+        else:
+            with tracer.span("validate_style", "validation", {"property": key}):
+                css_validator.validate(key, value)
         if self.ctx:
             with self.ctx._lock:  # type: ignore
                 self._styles[key] = value
+                self._invalidate()
         else:
             self._styles[key] = value
+            self._invalidate()
         return self
 
     # Class Management
@@ -115,6 +275,7 @@ class BaseTag(metaclass=base):
     def classes(self, value: str):
         with self.ctx._lock:  # type: ignore
             self._classes.append(value)
+            self._invalidate()
 
     def set_classes(self, mode: Literal["append", "override"], value: str) -> "BaseTag":
         if self.ctx:
@@ -123,11 +284,13 @@ class BaseTag(metaclass=base):
                     self._classes.append(value)
                 elif mode == "override":
                     self._classes = [value]
+                self._invalidate()
         else:
             if mode == "append":
                 self._classes.append(value)
             elif mode == "override":
                 self._classes = [value]
+            self._invalidate()
         return self
 
     # Attribute Management
@@ -144,20 +307,29 @@ class BaseTag(metaclass=base):
         if self.ctx:
             with self.ctx._lock:  # type: ignore
                 self._attributes.update(value)
+                self._invalidate()
         else:
             self._attributes.update(value)
+            self._invalidate()
 
     def set_attribute(self, key: str, value: str) -> "BaseTag":
-        attribute_validator.validate(key, value)
+        tracer = getattr(self.ctx, "tracer", None)
+        if tracer is None:
+            attribute_validator.validate(key, value)
+        else:
+            with tracer.span("validate_attribute", "validation", {"attribute": key}):
+                attribute_validator.validate(key, value)
         if self.ctx:
             with self.ctx._lock:  # type: ignore
                 if not value.startswith("subl:"):
                     value = html.escape(value)
                 self._attributes[key] = value
+                self._invalidate()
         else:
             if not value.startswith("subl:"):
                 value = html.escape(value)
             self._attributes[key] = value
+            self._invalidate()
         return self
 
     def href(self, value: str) -> "BaseTag":
@@ -166,6 +338,32 @@ class BaseTag(metaclass=base):
         self.set_attribute("href", value)
         return self
 
+    def on_click(self, callback: Callable[[], Any]) -> "BaseTag":
+        """
+        Link this <a> tag to a Python callback through the action registry. The callback belongs to the document
+        at the root of the tree and is dropped once that document is rebuilt without it, disposed or closed.
+        Inside a fragment rendered by `render_fragment`, such as a memoized component or a cached popup, it
+        belongs to the fragment's markup instead and lives as long as that markup is referenced.
+        """
+        return self.href(actions.href(callback, self._action_owner()))
+
+    def _action_owner(self) -> "BaseTag":
+        node = self
+        following = self.parent if self.parent is not None else getattr(self.ctx, "current", None)
+        while following is not None:
+            if following._owns_actions:
+                return following
+            node, following = following, following.parent
+        return node
+
+    def _root(self) -> "BaseTag":
+        """The element at the root of the tree, usually the `Vision` document. Works while still being built."""
+        node = self.parent if self.parent is not None else getattr(self.ctx, "current", None)
+        root = self
+        while node is not None:
+            root, node = node, node.parent
+        return root
+
     # Dimension Attributes
     def width(self, value: str) -> "BaseTag":
         self.set_style("width", value)
@@ -344,6 +542,9 @@ class BaseTag(metaclass=base):
             return self
         else:
             self._should_render = False
+            self._invalidate()
+            if self.ctx is not None:
+                self.ctx.tree_version += 1
             return self
 
     def when_or_else(
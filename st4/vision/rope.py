@@ -0,0 +1,63 @@
+from typing import List, Sequence, Union
+
+# Subtrees whose output is shorter than this are stored as a single string rather than a rope node
+ROPE_LEAF_SIZE = 8192
+
+
+class Rope:
+    """
+    An immutable tree of string segments with known lengths. Large subtrees cache their output as a rope
+    node referencing the cached output of their children, so when one deep element changes, every ancestor
+    only rebuilds a node of references instead of copying the whole document. Flattening joins the leaf
+    strings once, so every character is copied a single time however deep it is nested.
+
+    Attributes:
+        parts (tuple): Strings and nested ropes, in document order.
+        length (int): Total number of characters in the rope.
+    """
+
+    __slots__ = ("parts", "length", "_flat")
+
+    def __init__(self, parts: Sequence[Union[str, "Rope"]]):
+        self.parts = tuple(parts)
+        self.length = sum(len(part) for part in self.parts)
+        self._flat: Union[str, None] = None
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __str__(self) -> str:
+        # Collect the leaf strings of nested ropes and join them once, so a large leaf such as an embedded image is
+        # copied into the flattened text of the rope being flattened only, not into every rope in between. Nested
+        # ropes that were flattened before contribute their cached text.
+        if self._flat is None:
+            leaves: List[str] = []
+            stack = [iter(self.parts)]
+            while stack:
+                for part in stack[-1]:
+                    if isinstance(part, str):
+                        leaves.append(part)
+                    elif part._flat is not None:
+                        leaves.append(part._flat)
+                    else:
+                        stack.append(iter(part.parts))
+                        break
+                else:
+                    stack.pop()
+            self._flat = "".join(leaves)
+        return self._flat
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Rope, str)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+
+def join(parts: Sequence[Union[str, Rope]]) -> Union[str, Rope]:
+    """Combine parts into a rope, or into a plain string when the result is small."""
+    rope = Rope(parts)
+    if rope.length <= ROPE_LEAF_SIZE:
+        return str(rope)
+    return rope
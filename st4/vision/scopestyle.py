@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import sublime
+import sublime_plugin
+
+from .supported import css_validator
+
+DEFAULT_MAXSIZE = 4096
+
+COLOR_SCHEME_EXTENSIONS = (".sublime-color-scheme", ".tmTheme", ".hidden-tmTheme")
+
+
+class ScopeStyleStats(NamedTuple):
+    """
+    Statistics of a ScopeStyleCache.
+
+    Attributes:
+        hits (int): Lookups served from the cache.
+        misses (int): Lookups that called `style_for_scope`.
+        evictions (int): Entries dropped because the cache exceeded maxsize.
+        invalidations (int): Times entries were dropped because a color scheme changed.
+        currsize (int): Number of (color scheme, scope) entries currently cached.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    currsize: int
+
+
+def scheme_of(view: sublime.View) -> str:
+    """The color scheme a view is drawn with, resolving the light and dark variants of an "auto" scheme."""
+    settings = view.settings()
+    scheme = settings.get("color_scheme", "")
+    ui_info = getattr(sublime, "ui_info", None)
+    if scheme == "auto" and ui_info is not None:
+        variant = "dark_color_scheme" if ui_info()["system"]["style"] == "dark" else "light_color_scheme"
+        scheme = settings.get(variant, scheme)
+    return scheme
+
+
+class ScopeStyleCache:
+    """
+    Process-wide cache from (color scheme, scope) to the style `view.style_for_scope` resolves, so components
+    coloring text by scope cross into the Sublime API once per scope and scheme instead of once per token.
+    Styles are kept as CSS declarations that passed `css_validator`, ready for `set_style` or a `style` tag,
+    along with the same declarations joined into an inline style attribute.
+
+    The scheme is part of the key, so switching schemes starts with fresh entries. Entries of a scheme are
+    dropped when its file is saved, this needs the `VisionScopeStyleListener` below to be imported into a top
+    level plugin module. Backgrounds equal to the scheme's default background are left out.
+
+    Attributes:
+        maxsize (int): Upper bound on cached entries, least recently used ones are dropped first.
+
+    Example usage:
+        for region, scope in view.extract_tokens_with_scopes(region):
+            token = ctx.span(view.substr(region))
+            for key, value in scope_styles.style(view, scope).items():
+                token.set_style(key, value)
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, str], str]]" = OrderedDict()
+        # Default background of each scheme, left out of the resolved styles
+        self._backgrounds: Dict[str, Optional[str]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def style(self, view: sublime.View, scope: str, scheme: Optional[str] = None) -> Dict[str, str]:
+        """CSS declarations of the scope, e.g. {"color": "#c594c5", "font-weight": "bold"}. Do not mutate it."""
+        return self._entry(view, scope, scheme)[0]
+
+    def inline(self, view: sublime.View, scope: str, scheme: Optional[str] = None) -> str:
+        """The declarations of `style` as an inline style attribute value, empty when the scope is unstyled."""
+        return self._entry(view, scope, scheme)[1]
+
+    def _entry(self, view: sublime.View, scope: str, scheme: Optional[str]) -> Tuple[Dict[str, str], str]:
+        # Callers resolving many scopes of one view pass the scheme to avoid reading the view settings each time
+        key = (scheme_of(view) if scheme is None else scheme, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+            known = key[0] in self._backgrounds
+            background = self._backgrounds.get(key[0])
+
+        # Resolve outside the lock, two threads resolving the same scope at once store the same style
+        if not known:
+            background = view.style().get("background")
+        entry = self._resolve(view.style_for_scope(scope), background)
+        with self._lock:
+            self._backgrounds.setdefault(key[0], background)
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return entry
+
+    @staticmethod
+    def _resolve(resolved: dict, default_background: Optional[str]) -> Tuple[Dict[str, str], str]:
+        declarations: Dict[str, str] = {}
+        if resolved.get("foreground"):
+            declarations["color"] = resolved["foreground"]
+        if resolved.get("background") and resolved["background"] != default_background:
+            declarations["background-color"] = resolved["background"]
+        if resolved.get("bold"):
+            declarations["font-weight"] = "bold"
+        if resolved.get("italic"):
+            declarations["font-style"] = "italic"
+        for key, value in list(declarations.items()):
+            try:
+                css_validator.validate(key, value)
+            except ValueError:
+                del declarations[key]
+        return declarations, "; ".join(f"{key}: {value}" for key, value in declarations.items())
+
+    def invalidate(self, scheme: Optional[str] = None):
+        """Drop the entries of a color scheme, or of every scheme."""
+        with self._lock:
+            if scheme is None:
+                self._entries.clear()
+                self._backgrounds.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == scheme]:
+                    del self._entries[key]
+                self._backgrounds.pop(scheme, None)
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._backgrounds.clear()
+            self._hits = self._misses = self._evictions = self._invalidations = 0
+
+    def stats(self) -> ScopeStyleStats:
+        with self._lock:
+            return ScopeStyleStats(self._hits, self._misses, self._evictions, self._invalidations, len(self._entries))
+
+
+scope_styles = ScopeStyleCache()
+
+
+class VisionScopeStyleListener(sublime_plugin.EventListener):
+    """Drops cached scope styles when a color scheme file is saved, its overrides may affect any scheme."""
+
+    def on_post_save(self, view: sublime.View):
+        file_name = view.file_name() or ""
+        if file_name.endswith(COLOR_SCHEME_EXTENSIONS):
+            scope_styles.invalidate()
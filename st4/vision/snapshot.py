@@ -0,0 +1,235 @@
+import importlib
+import json
+import struct
+import weakref
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from .renderable import BaseTag
+from .style import style
+from .text import Text
+from .types import ContextBase
+from .vision import Vision
+
+SNAPSHOT_MAGIC = b"VSNP"
+SNAPSHOT_VERSION = 1
+
+# magic, format version, crc32 of the compressed payload
+_HEADER = struct.Struct(">4sBI")
+
+
+def _vision_transient() -> frozenset:
+    probe = Vision.__new__(Vision)
+    probe._reset_transient()
+    return frozenset(probe.__dict__)
+
+
+# Attributes that describe a node's place in a live tree rather than its content. They are rebuilt on load.
+_TRANSIENT = (
+    frozenset(["ctx", "_parent_ref", "_children", "_previous_current", "_html", "_digest"]) | _vision_transient()
+)
+
+# How each restored class is decoded, worked out once per entry of the class table
+_NODE, _STYLE, _TEXT, _VISION = range(4)
+
+# Attributes restored positionally for every node, so they are not repeated in the extras dict.
+_FIELDS = ("tag", "id", "_classes", "_styles", "_attributes", "_should_render", "_content")
+
+
+class SnapshotError(ValueError):
+    """Raised when snapshot data is truncated, corrupted or written by an unsupported format version."""
+
+
+def _is_plain(value: Any) -> bool:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _is_plain(v) for k, v in value.items())
+    return False
+
+
+def _in_package(module_name: str) -> bool:
+    return module_name == __package__ or module_name.startswith(f"{__package__}.")
+
+
+class _Encoder:
+    def __init__(self):
+        self.classes: List[str] = []
+        self._class_index: Dict[Type, int] = {}
+
+    def class_ref(self, cls: Type) -> int:
+        index = self._class_index.get(cls)
+        if index is None:
+            index = len(self.classes)
+            self.classes.append(f"{cls.__module__}:{cls.__qualname__}")
+            self._class_index[cls] = index
+        return index
+
+    def encode(self, node: Any) -> list:
+        if not _in_package(type(node).__module__):
+            # Classes defined by plugins are refused on load, keep their markup instead
+            return [self.class_ref(Text), node.render()]
+        if isinstance(node, style):
+            return [self.class_ref(type(node)), node.css]
+
+        extras = {k: v for k, v in node.__dict__.items() if k not in _TRANSIENT and k not in _FIELDS}
+        if not _is_plain(extras):
+            # Widgets holding views, sheets or foreign objects can't be rebuilt from data, keep their markup.
+            return [self.class_ref(Text), node.render()]
+
+        children = None
+        if hasattr(node, "_children"):
+            children = [self.encode(child) for child in node._children if child is not None]
+        return [
+            self.class_ref(type(node)),
+            node.tag,
+            node.id,
+            node._classes,
+            node._styles,
+            node._attributes,
+            node._should_render,
+            getattr(node, "_content", ""),
+            children,
+            extras,
+        ]
+
+
+def _resolve_class(name: str) -> Type:
+    module_name, _, qualname = name.partition(":")
+    # Only classes from this package are restored, a snapshot must never import arbitrary code.
+    if not _in_package(module_name):
+        raise SnapshotError(f"Refusing to restore class '{name}' from outside the {__package__} package")
+    obj: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        obj = getattr(obj, part, None)
+    if not isinstance(obj, type) or not issubclass(obj, BaseTag):
+        raise SnapshotError(f"Unknown node class '{name}'")
+    return obj
+
+
+def _restore_key(key: Any) -> Any:
+    # JSON turns tuple keys into lists, which can't be looked up by reconciliation
+    if isinstance(key, list):
+        return tuple(_restore_key(part) for part in key)
+    return key
+
+
+def _kind(cls: Type) -> int:
+    if issubclass(cls, style):
+        return _STYLE
+    if issubclass(cls, Text):
+        return _TEXT
+    if issubclass(cls, Vision):
+        return _VISION
+    return _NODE
+
+
+def _decode(ctx: ContextBase, classes: List[Type], kinds: List[int], data: list, parent: Any) -> Any:
+    index = data[0]
+    cls = classes[index]
+    kind = kinds[index]
+    if kind == _STYLE:
+        node = cls(None, data[1])
+        node.ctx = ctx
+        return node
+    # Bypass __init__ and the metaclass, the data was validated when the original tree was built.
+    node = cls.__new__(cls)
+    state = node.__dict__
+    parent_ref = weakref.ref(parent) if parent is not None else None
+    if kind == _TEXT and len(data) == 2:
+        state.update(
+            ctx=ctx,
+            tag="",
+            id=None,
+            _classes=[],
+            _styles={},
+            _attributes={},
+            _should_render=True,
+            _content=data[1],
+            _parent_ref=parent_ref,
+        )
+        return node
+
+    _, tag_name, id_value, classes_, styles, attributes, should_render, content, children, extras = data
+    state.update(extras)
+    if "key" in extras:
+        state["key"] = _restore_key(extras["key"])
+    state.update(
+        ctx=ctx,
+        tag=tag_name,
+        id=id_value,
+        _classes=classes_,
+        _styles=styles,
+        _attributes=attributes,
+        _should_render=should_render,
+        _content=content,
+        _parent_ref=parent_ref,
+    )
+    if children is not None:
+        state["_children"] = [_decode(ctx, classes, kinds, child, node) for child in children]
+    if kind == _VISION:
+        node._reset_transient()
+    return node
+
+
+def dumps(node: BaseTag, html: Optional[str] = None) -> bytes:
+    """
+    Serialize a `Vision` document or any `tag` subtree into a compact, versioned snapshot.
+
+    The snapshot stores tag names, ids, classes, styles, attributes, content and children, plus the rendered
+    HTML so a reloaded plugin can push the previous frame to its sheet before rebuilding anything. When html
+    is not given, the node's `last_html` is used if it has one, otherwise the tree is rendered. Elements of
+    classes defined outside this package, and widgets holding live objects, are stored as their rendered markup.
+
+    Layout:
+        4 bytes magic, 1 byte version, 4 bytes crc32, followed by zlib compressed JSON.
+    """
+    with node.ctx._lock:  # type: ignore
+        if html is None:
+            html = getattr(node, "last_html", "") or node.render()
+        encoder = _Encoder()
+        tree = encoder.encode(node)
+    payload = zlib.compress(
+        json.dumps([encoder.classes, tree, html], separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    )
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(payload)) + payload
+
+
+def _read(data: bytes) -> Tuple[List[str], list, str]:
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, checksum = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a Vision snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}")
+    payload = memoryview(data)[_HEADER.size :]
+    if zlib.crc32(payload) != checksum:
+        raise SnapshotError("Snapshot checksum mismatch")
+    try:
+        classes, tree, html = json.loads(zlib.decompress(payload).decode("utf-8"))
+    except (zlib.error, ValueError) as e:
+        raise SnapshotError(f"Snapshot payload is corrupted: {e}") from None
+    return classes, tree, html
+
+
+def loads(ctx: ContextBase, data: bytes) -> Any:
+    """
+    Restore a tree written by `dumps` into the given context. The restored root is detached from
+    `ctx.current`; a restored `Vision` gets its `last_html` back and no sheet.
+    """
+    class_names, tree, html = _read(data)
+    classes = [_resolve_class(name) for name in class_names]
+    kinds = [_kind(cls) for cls in classes]
+    with ctx._lock:  # type: ignore
+        root = _decode(ctx, classes, kinds, tree, None)
+    if hasattr(root, "last_html"):
+        root.last_html = html
+    return root
+
+
+def load_html(data: bytes) -> str:
+    """Return only the rendered HTML stored in a snapshot, without rebuilding the tree."""
+    return _read(data)[2]
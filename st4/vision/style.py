@@ -1,6 +1,8 @@
+import hashlib
 from typing import Any, Dict, Optional
 
 from .renderable import BaseTag
+from .stylesheet import StyleSheet
 
 
 class style(BaseTag):
@@ -19,23 +21,43 @@ class style(BaseTag):
 
     """
 
+    _render_state = ("_html", "_digest", "_merged_css")
+
     def __init__(self, ctx: Any, default_css: Optional[Dict]):
         self.ctx = ctx
-        self.css = default_css or {}
+        self.sheet = StyleSheet(default_css)
         self.tag = self.__class__.__name__
+        self.parent = None
+        self.key = None
+        self._html = None
+        # Set by the owning document while it renders a merged sheet in place of the individual ones
+        self._merged_css: Optional[str] = None
+
+    @property
+    def css(self) -> Dict[str, Dict[str, Any]]:
+        return self.sheet.rules
 
     def add_css(self, selector: str, properties: dict):
-        if selector in self.css:
-            self.css[selector].update(properties)
+        if self.ctx:
+            with self.ctx._lock:
+                self.sheet.add_css(selector, properties)
+                self._merged_css = None
+                self._invalidate()
         else:
-            self.css[selector] = properties
+            self.sheet.add_css(selector, properties)
+            self._merged_css = None
+            self._invalidate()
+
+    def content_digest(self) -> bytes:
+        if self._digest is None:
+            canonical = {selector: sorted(props.items()) for selector, props in self.sheet._rules.items()}
+            self._digest = hashlib.blake2b(repr(canonical).encode("utf-8"), digest_size=16).digest()
+        return self._digest
+
+    def wrap(self, css_str: str) -> str:
+        return f"<{self.tag}>{css_str}</{self.tag}>" if css_str else ""
 
     def render(self) -> str:
-        css_str = ""
-        for selector, props in self.css.items():
-            props_str = ""
-            for key, value in props.items():
-                props_str += f"{key}: {value}; " if not str(value).endswith(";") else f"{key}: {value} "
-            props_str.rstrip()
-            css_str += f"{selector} {{{props_str}}}\n"
-        return f"<{self.tag}>{css_str}</{self.tag}>"
+        if self._html is None:
+            self._html = self.wrap(self.sheet.compile() if self._merged_css is None else self._merged_css)
+        return self._html
@@ -76,6 +76,7 @@ class AllowedAttributes(Enum):
     CLASS = "class"
     TITLE = "title"
     SRC = "src"
+    ALT = "alt"
 
 
 @dataclass(frozen=True)
@@ -130,6 +131,7 @@ attribute_validator.add_attribute(Attribute(AllowedAttributes.CLASS.value))
 attribute_validator.add_attribute(Attribute(AllowedAttributes.ID.value))
 attribute_validator.add_attribute(Attribute(AllowedAttributes.TITLE.value))
 attribute_validator.add_attribute(Attribute(AllowedAttributes.SRC.value))
+attribute_validator.add_attribute(Attribute(AllowedAttributes.ALT.value))
 
 
 @dataclass(frozen=True)
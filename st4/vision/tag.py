@@ -1,8 +1,9 @@
 import html
 import re
-from typing import Any, Iterable, List, Union
+from typing import Any, Callable, Iterable, List, Tuple, Union
 
 from .renderable import BaseTag
+from .rope import ROPE_LEAF_SIZE, Rope, join
 from .style import style
 from .text import Text
 
@@ -21,6 +22,16 @@ def _remove_entities(text):
     return RE_BAD_ENTITIES.sub(repl, text)
 
 
+_SPECIAL = frozenset("&<>\"'")
+
+
+def _escape(text: str) -> str:
+    """Escape text for element content, most content has nothing to escape."""
+    if _SPECIAL.isdisjoint(text):
+        return text
+    return _remove_entities(html.escape(text))
+
+
 class tag(BaseTag):
     """
     Extends BaseTag to handle content management and child elements specifically. This class allows for the creation
@@ -49,6 +60,8 @@ class tag(BaseTag):
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.ctx is not None:
             self.ctx.pop(self)
+            # Don't keep the strong reference to the enclosing element around, it would form a cycle
+            self._previous_current = None
 
     # Child Handling
     def child(self, *elems: Union["tag", style, Text, Iterable[Union["tag", style, Text]]]):
@@ -56,26 +69,55 @@ class tag(BaseTag):
             for elem in elems:
                 if isinstance(elem, (tag, style, Text)):
                     self._children.append(elem)
+                    elem.parent = self
                 else:
-                    self._children.extend(elem)
+                    for item in elem:
+                        self._children.append(item)
+                        item.parent = self
+            self._invalidate()
+            self.ctx.tree_version += 1  # type: ignore
         return self
 
     # Content Management
-    def content(self, content: str, escape: bool = True) -> "tag":
+    def content(self, content: Union[str, Callable[[], Any]], escape: bool = True) -> "tag":
+        """
+        Set the text of the element. A callable is a content provider, called when the element is rendered and
+        only if it is shown. Its result is cached until the element changes.
+        """
         if not content:
             return self
         with self.ctx._lock:  # type: ignore
-            if escape:
-                self._content = _remove_entities(html.escape(content))
+            if callable(content):
+                self._provider = content
+                self._provider_escape = _escape if escape else None
+                self._content = ""
             else:
-                self._content = content
+                self._provider = None
+                self._provided = None
+                self._content = _escape(content) if escape else content
+            self._invalidate()
         return self
 
+    def _render_attributes(self) -> Iterable[Tuple[str, str]]:
+        """Attributes written into the opening tag, subclasses may add ones that are only known at render time."""
+        return self._attributes.items()
+
     def render(self) -> str:
         """
-        Recursively render the element and its children to an HTML string.
+        Recursively render the element and its children to an HTML string. Unchanged subtrees return their cached HTML.
+        """
+        output = self.render_rope()
+        return output if isinstance(output, str) else str(output)
+
+    def render_rope(self) -> Union[str, Rope]:
+        """
+        Render the element to a string, or to a rope of its children's cached output when it is large. Ancestors of a
+        changed element rebuild only their list of parts, the document is copied once when the rope is flattened.
         """
+        if self._html is not None:
+            return self._html
         if self._should_render is False:
+            self._html = ""
             return ""
 
         with self.ctx._lock:  # type: ignore
@@ -84,30 +126,44 @@ class tag(BaseTag):
             style_attr = f' style="{style_str}"' if style_str else ""
 
             # Convert attributes dictionary to an attributes string, excluding class and id as they're handled separately
-            attr_str = " ".join(
-                f"{key}='{value}'" for key, value in self._attributes.items() if key not in ["id", "class"]
-            )
+            attributes = [(key, value) for key, value in self._render_attributes() if key not in ["id", "class"]]
 
             # Handle id and class attributes specially to ensure they're included
             id_attr = f' id="{self.id}"' if self.id else ""
             class_attr = f' class="{" ".join(self._classes)}"' if self._classes else ""
 
             # Opening tag with attributes and styles
-            open_tag = f"<{self.tag}{id_attr}{class_attr}{style_attr}{' ' + attr_str if attr_str else ''}>"
+            open_tag: Union[str, Rope]
+            # Decide from the lengths alone, joining the values first would copy them anyway
+            if sum(len(key) + len(value) + 4 for key, value in attributes) > ROPE_LEAF_SIZE:
+                # Splice large values such as data URIs into the output as they are instead of copying them
+                pieces: List[str] = [f"<{self.tag}{id_attr}{class_attr}{style_attr}"]
+                for key, value in attributes:
+                    pieces.extend((f" {key}='", value, "'"))
+                pieces.append(">")
+                open_tag = Rope(pieces)
+            else:
+                attr_str = " ".join(f"{key}='{value}'" for key, value in attributes)
+                open_tag = f"<{self.tag}{id_attr}{class_attr}{style_attr}{' ' + attr_str if attr_str else ''}>"
             if self.tag.lower() in SELF_CLOSING_TAGS:
+                self._html = open_tag
                 return open_tag
 
-        # Recursively render children and concatenate their HTML
-        children_html = ""
+        # Recursively render children, subclasses overriding render() are asked for their string
+        parts: List[Union[str, Rope]] = [open_tag, self._resolved_content()]
         for child in self._children:
             if child is None:
                 continue
-            children_html = f"{children_html}{child.render()}"
+            if isinstance(child, tag) and type(child).render is tag.render:
+                parts.append(child.render_rope())
+            else:
+                parts.append(child.render())
 
         # Closing tag
-        close_tag = f"</{self.tag}>"
+        parts.append(f"</{self.tag}>")
         # Combine everything
-        return f"{open_tag}{self._content}{children_html}{close_tag}"
+        self._html = join(parts)
+        return self._html
 
     # Query Methods
     def query_by_id(self, id_value: str) -> Union["tag", None]:
@@ -133,7 +189,8 @@ class tag(BaseTag):
         if class_value in self._classes:
             results.append(self)
         for child in self._children:
-            if isinstance(child, tag):
+            # Lazy subtrees aren't tags but are searched as well
+            if isinstance(child, tag) or hasattr(child, "query_by_class"):
                 additional_results = child.query_by_class(class_value)
                 if additional_results:  # Ensure that additional_results is not None and is iterable
                     results.extend(additional_results)
@@ -169,9 +226,12 @@ class SelfClosingTag(BaseTag):
 
     def render(self):
         """
-        Recursively render the element and its children to an HTML string.
+        Render the element to an HTML string, reusing the cached HTML when nothing changed.
         """
+        if self._html is not None:
+            return self._html
         if self._should_render is False:
+            self._html = ""
             return ""
 
         with self.ctx._lock:  # type: ignore
@@ -190,5 +250,5 @@ class SelfClosingTag(BaseTag):
 
             # Opening tag with attributes and styles
             open_tag = f"<{self.tag}{id_attr}{class_attr}{style_attr}{' ' + attr_str if attr_str else ''}>"
-            if self.tag.lower() in SELF_CLOSING_TAGS:
-                return open_tag
+            self._html = open_tag
+            return open_tag
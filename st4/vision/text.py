@@ -1,3 +1,5 @@
+from typing import Any, Callable, Union
+
 from .types import ContextBase
 from .renderable import BaseTag
 
@@ -8,17 +10,25 @@ class Text(BaseTag):
     specific HTML tag but is used for inserting raw text into the HTML structure. It does not support nesting (i.e., cannot
     contain child elements), making it suitable for adding unstyled text.
 
+    The content can also be a provider callable, which is called when the text is rendered and only if it is
+    shown. Its result is inserted as is and cached until the text changes.
+
     Example usage:
         Text("This is some plain text.")
+        Text(ctx, lambda: format_size(os.path.getsize(path)))
     """
 
-    def __init__(self, ctx: ContextBase, content: str):
+    def __init__(self, ctx: ContextBase, content: Union[str, Callable[[], Any]]):
         super().__init__(ctx, "")
-        self._content = content
+        if callable(content):
+            self._provider = content
+            self._content = ""
+        else:
+            self._content = content
 
     def child(self, *elems):
         # Override to prevent any children from being added
         raise TypeError("Text cannot contain children.")
 
     def render(self):
-        return self._content
+        return self._resolved_content()
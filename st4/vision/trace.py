@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 65536
+
+# name, category, thread id, start ns, end ns, args
+_Event = Tuple[str, str, int, int, int, Optional[Dict[str, Any]]]
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed section recorded by a Tracer when it exits. Spans nest by time on each thread."""
+
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Optional[Dict[str, Any]]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    Records nested timing spans of a refresh, such as build, validation, render, highlighting, image encoding
+    and the sheet update, into a bounded ring buffer and exports them as Chrome Trace Event JSON, which can
+    be opened in chrome://tracing or Perfetto. Once the buffer is full the oldest events are dropped.
+
+    Attributes:
+        capacity (int): Maximum number of events kept.
+
+    Example usage:
+        tracer = ctx.enable_tracing()
+        vision.render_to_sheet("Report")
+        tracer.export(os.path.join(sublime.cache_path(), "vision-trace.json"))
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._events: Deque[_Event] = deque(maxlen=capacity)
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter_ns()
+
+    def span(self, name: str, category: str = "vision", args: Optional[Dict[str, Any]] = None) -> Span:
+        return Span(self, name, category, args)
+
+    def record(self, name: str, category: str, start: int, end: int, args: Optional[Dict[str, Any]] = None):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        # deque.append is atomic, so spans from worker threads need no extra locking
+        self._events.append((name, category, tid, start, end, args))
+
+    def clear(self):
+        self._events.clear()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self._threads.items())
+        ]
+        for name, category, tid, start, end, args in list(self._events):
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, separators=(",", ":"), default=str)
+
+
+def span(ctx: Any, name: str, category: str = "vision", args: Optional[Dict[str, Any]] = None) -> Any:
+    """Return a span of the context's tracer, or a shared no-op when tracing is off."""
+    tracer = getattr(ctx, "tracer", None)
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, category, args)
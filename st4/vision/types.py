@@ -1,4 +1,7 @@
 class ContextBase:
+    # Incremented whenever elements are attached, detached or hidden, so documents can cache structural lookups
+    tree_version: int = 0
+
     def __init__(self): ...
 
     def push(self, instance): ...
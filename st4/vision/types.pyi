@@ -1,8 +1,9 @@
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from .renderable import BaseTag
 
 class ContextBase:
+    tree_version: int
     def __init__(self): ...
     def a(self, href: Optional[str], content: Optional[str], *args, **kwargs) -> BaseTag: ...
     def b(self, content: Optional[str], *args, **kwargs) -> BaseTag: ...
@@ -23,6 +24,9 @@ class ContextBase:
     def html(self, content: Optional[str], *args, **kwargs) -> BaseTag: ...
     def i(self, content: Optional[str], *args, **kwargs) -> BaseTag: ...
     def img(self, src: Optional[str], *args, **kwargs) -> BaseTag: ...
+    def lazy(
+        self, condition: Any, then: Callable[[], Any], otherwise: Optional[Callable[[], Any]] = None, *args, **kwargs
+    ) -> BaseTag: ...
     def li(self, content: Optional[str], *args, **kwargs) -> BaseTag: ...
     def ol(self, *args, **kwargs) -> BaseTag: ...
     def p(self, content: Optional[str], *args, **kwargs) -> BaseTag: ...
@@ -1,42 +1,21 @@
-import base64
+import html
+import weakref
 from enum import Enum
-from typing import List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-import mdpopups
 import sublime
 
+from .diskcache import FragmentStore, content_key
 from .div import div
+from .highlight import fence_language, highlight, highlight_async, highlight_batch, highlight_scopes, placeholder
+from .images import ImageType, images
+from .renderable import BaseTag
+from .scopestyle import scheme_of
 from .tag import tag
+from .trace import span
 from .types import ContextBase
 
 
-class ImageType(Enum):
-    """
-    An enumeration to represent different types of image formats supported.
-
-    Attributes:
-        PNG (int): Represents an image in Portable Network Graphics format.
-        JPEG (int): Represents an image in Joint Photographic Experts Group format.
-        Base64 (int): Indicates that the image is encoded in Base64 format, usually for embedding directly into web pages.
-    """
-
-    PNG = 1
-    JPEG = 2
-    Base64 = 3
-
-
-def _image_to_base64(path: str, image_type: ImageType = ImageType.PNG) -> str:
-    data = sublime.load_binary_resource(path)
-    if image_type == ImageType.PNG:
-        return f'data:image/png;base64,{base64.b64encode(data).decode("ascii")}'
-    elif image_type == ImageType.JPEG:
-        return f'data:image/jpeg;base64,{base64.b64encode(data).decode("ascii")}'
-    elif image_type == ImageType.Base64:
-        return path
-    else:
-        raise ValueError("Invalid image type")
-
-
 class Card(tag):
     def __init__(
         self,
@@ -87,13 +66,48 @@ class CodeBlock(tag):
     Represents a block of code or a code snippet within a web page.
     The code block is styled to display monospaced text and may include syntax highlighting.
 
+    When rendered as part of a `Vision`, every code block of the document that needs highlighting is highlighted
+    before rendering starts, with one `md2html` call per view and language instead of one per block.
+
+    With `async_highlight` the block renders its code unhighlighted at once and is highlighted on the async
+    thread. Once highlighted it is invalidated and the `Vision` it belongs to re-renders its sheets, once for
+    all the blocks that finished in the meantime.
+
+    Code shown from an open view, built with `CodeBlock.from_view`, is highlighted from the scope tokens of the
+    view instead, without any Markdown conversion. That is cheap enough to always run synchronously.
+
     Attributes:
         content (str): The code snippet or block of code to display.
+        cache (Optional[FragmentStore]): Store for highlighted output, keyed by code and color scheme.
+        async_highlight (bool): Render a plain placeholder and highlight in the background.
+        region (Optional[sublime.Region]): Region of `view` the code was read from, highlighted natively.
+
+    Example usage:
+        CodeBlock.from_view(ctx, view, view.line(view.sel()[0]))
     """
 
-    def __init__(self, ctx: ContextBase, code: str, view: Optional[sublime.View] = None):
+    # The highlighted markup is derived from the code at render time
+    _render_state = ("_html", "_digest", "_content", "_highlighted_for", "_pending_key")
+    _batch_render = True
+
+    def __init__(
+        self,
+        ctx: ContextBase,
+        code: str,
+        view: Optional[sublime.View] = None,
+        cache: Optional[FragmentStore] = None,
+        async_highlight: bool = False,
+        region: Optional[sublime.Region] = None,
+    ):
         super().__init__(ctx, "div")
         self.code = code
+        self.cache = cache
+        self.async_highlight = async_highlight and region is None
+        self.region = region
+        # Color scheme and code the current content was highlighted for
+        self._highlighted_for: Optional[Tuple[str, str]] = None
+        # Color scheme and code being highlighted in the background while the placeholder is shown
+        self._pending_key: Optional[Tuple[str, str]] = None
         if view is None:
             window = sublime.active_window()
             if window is None:
@@ -102,9 +116,142 @@ class CodeBlock(tag):
         else:
             self.view = view
 
+    @classmethod
+    def from_view(
+        cls, ctx: ContextBase, view: sublime.View, region: sublime.Region, cache: Optional[FragmentStore] = None
+    ) -> "CodeBlock":
+        """Show the text of a region of an open view, highlighted from the scope tokens of the view."""
+        return cls(ctx, view.substr(region), view=view, cache=cache, region=region)
+
+    def _hash_parts(self):
+        # The color scheme decides the highlighted markup as much as the code does
+        return self._highlight_key()
+
+    @classmethod
+    def revalidate(cls, nodes: List[BaseTag]):
+        """Invalidate blocks highlighted for another color scheme than the one their view uses now."""
+        schemes: Dict[int, str] = {}
+        for node in nodes:
+            if not isinstance(node, CodeBlock) or node._highlighted_for is None or node.view is None:
+                continue
+            view_id = node.view.id()
+            scheme = schemes.get(view_id)
+            if scheme is None:
+                scheme = schemes[view_id] = scheme_of(node.view)
+            if node._highlighted_for != (scheme, node.code):
+                node._invalidate()
+
+    def _highlight_key(self) -> Tuple[str, str]:
+        scheme = scheme_of(self.view) if self.view is not None else ""
+        return (scheme, self.code)
+
+    def _cache_key(self, key: Tuple[str, str]) -> str:
+        if self.region is not None:
+            return content_key("CodeBlock", "scopes", key[0], key[1])
+        return content_key("CodeBlock", key[0], key[1])
+
+    def _highlight(self) -> str:
+        if self.region is not None:
+            with span(self.ctx, "highlight_scopes", "codeblock", {"chars": len(self.code)}):
+                return highlight_scopes(self.view, self.region)
+        with span(self.ctx, "highlight", "codeblock", {"chars": len(self.code)}):
+            return highlight(self.view, self.code)
+
+    def _highlighted(self, key: Tuple[str, str], markup: str):
+        # Called on the async thread once the background highlighting of key finished. With pooling the block
+        # may have been recycled meanwhile, its attributes are cleared or belong to another block then.
+        ctx = getattr(self, "ctx", None)
+        if ctx is None:
+            return
+        with ctx._lock:  # type: ignore
+            if getattr(self, "_pending_key", None) != key:
+                # Recycled or rebuilt with other code in the meantime
+                return
+            self._pending_key = None
+            self._content, self._highlighted_for = markup, key
+            self._invalidate()
+            root = self._root()
+        request_refresh = getattr(root, "request_refresh", None)
+        if request_refresh is not None:
+            request_refresh()
+
+    @classmethod
+    def _highlight_in_background(cls, group: List[Tuple["CodeBlock", Tuple[str, str]]]):
+        """Show the placeholder of every block and highlight them on the async thread, batched."""
+        jobs = []
+        for node, key in group:
+            node._content, node._pending_key = placeholder(node.code), key
+            view_id = node.view.id() if node.view is not None else 0
+            jobs.append(((view_id, *key), node.code, cls._on_highlighted(node, key)))
+        highlight_async(group[0][0].view, jobs)
+
+    @staticmethod
+    def _on_highlighted(node: "CodeBlock", key: Tuple[str, str]) -> Callable[[str], None]:
+        # Holds the block weakly, a block dropped from the document before highlighting finished is not kept alive
+        ref = weakref.ref(node)
+        cache, cache_key = node.cache, node._cache_key(key)
+
+        def done(markup: str):
+            if cache is not None:
+                cache.put(cache_key, markup)
+            target = ref()
+            if target is not None:
+                target._highlighted(key, markup)
+
+        return done
+
+    @classmethod
+    def prepare_render(cls, nodes: List[BaseTag]):
+        """
+        Highlight every block that needs it, batched per view and fenced language. Blocks highlighted in the
+        background are batched the same way, including single blocks.
+        """
+        groups: Dict[Tuple[int, str, bool], List[Tuple[CodeBlock, Tuple[str, str]]]] = {}
+        for node in nodes:
+            if not isinstance(node, CodeBlock) or node._html is not None or node.region is not None:
+                continue
+            key = node._highlight_key()
+            if node._highlighted_for == key or node._pending_key == key:
+                continue
+            cached = node.cache.get(node._cache_key(key)) if node.cache is not None else None
+            if cached is not None:
+                node._content, node._highlighted_for, node._pending_key = cached, key, None
+                continue
+            view_id = node.view.id() if node.view is not None else 0
+            groups.setdefault((view_id, fence_language(node.code), node.async_highlight), []).append((node, key))
+
+        for (_, language, in_background), group in groups.items():
+            if in_background:
+                cls._highlight_in_background(group)
+                continue
+            if len(group) < 2:
+                # A single block gains nothing from batching, it is highlighted when it renders
+                continue
+            first = group[0][0]
+            with span(first.ctx, "highlight_batch", "codeblock", {"language": language, "blocks": len(group)}):
+                highlighted = highlight_batch(first.view, [node.code for node, _ in group])
+            for (node, key), markup in zip(group, highlighted):
+                node._content, node._highlighted_for = markup, key
+                if node.cache is not None:
+                    node.cache.put(node._cache_key(key), markup)
+
     def render(self):
         # Returns an HTML string for a preformatted code block with the specified content
-        self.content(mdpopups.md2html(self.view, self.code, md=True), escape=False)
+        if self._html is None:
+            key = self._highlight_key()
+            if self._highlighted_for != key:
+                if self.async_highlight:
+                    cached = self.cache.get(self._cache_key(key)) if self.cache is not None else None
+                    if cached is not None:
+                        self._content, self._highlighted_for, self._pending_key = cached, key, None
+                    elif self._pending_key != key:
+                        self._highlight_in_background([(self, key)])
+                    return super().render()
+                if self.cache is None:
+                    highlighted = self._highlight()
+                else:
+                    highlighted = self.cache.get_or_render(self._cache_key(key), self._highlight)
+                self._content, self._highlighted_for = highlighted, key
         return super().render()
 
 
@@ -144,6 +291,9 @@ class Spacer(tag):
         self.space = space  # Define the amount of space (width) the spacer should take up
         self.unit = unit.value  # Define the unit of measurement for the spacer width
 
+    def _hash_parts(self):
+        return (self.space, self.unit)
+
     def render(self):
         # Returns an HTML string for an image tag with the specified width and no image source
         return f'<img style="width: {self.space or 0}{self.unit};">'
@@ -158,6 +308,7 @@ class Button(tag):
     Attributes:
         label (str): The text displayed on the button.
         href (str): The URL to which the button links. If empty, the button will not link anywhere.
+        on_click (Optional[Callable]): Python callback run when the button is clicked, used instead of href.
 
     Styling:
         The button uses background and foreground color variables for theming,
@@ -165,7 +316,9 @@ class Button(tag):
         to avoid the underline commonly associated with hyperlinks.
     """
 
-    def __init__(self, ctx: ContextBase, label: str, href: str = ""):
+    def __init__(
+        self, ctx: ContextBase, label: str, href: str = "", on_click: Optional[Callable[[], Any]] = None
+    ):
         super().__init__(ctx, "a")
         self.bg_color("var(--background)")  # Set background color using a CSS variable
         self.color("var(--foreground)")  # Set text color using a CSS variable
@@ -173,7 +326,10 @@ class Button(tag):
         self.border("1px", "solid", "var(--foreground)")  # Solid border using the foreground color
         self.text_decoration_none()  # No underline or other text decoration
         self.content(label)  # Set the visible text on the button
-        self.href(href)  # Set the hyperlink reference
+        if on_click is not None:
+            self.on_click(on_click)  # Dispatch clicks to a Python callback
+        else:
+            self.href(href)  # Set the hyperlink reference
 
 
 class ButtonGroup:
@@ -223,21 +379,100 @@ class Link(tag):
     Attributes:
         label (str): The text displayed on the hyperlink.
         href (str): The URL the link points to. If empty, the hyperlink will not navigate anywhere.
+        on_click (Optional[Callable]): Python callback run when the link is clicked, used instead of href.
 
     Styling:
         The link is styled with a background and foreground color defined by CSS variables.
         It serves both as navigational and aesthetic purposes in web interfaces.
     """
 
-    def __init__(self, ctx: ContextBase, label: str, href: str = ""):
+    def __init__(
+        self, ctx: ContextBase, label: str, href: str = "", on_click: Optional[Callable[[], Any]] = None
+    ):
         super().__init__(ctx, "a")
         self.bg_color("var(--background)")
         self.color("var(--foreground)")
         self.content(label)
-        self.href(href)
+        if on_click is not None:
+            self.on_click(on_click)
+        else:
+            self.href(href)
 
 
-class Icon(tag):
+class _DeferredImage(tag):
+    """
+    An <img> whose source is loaded and encoded on the image thread pool. Building the element only starts the
+    request, the data URI is filled in when the element is rendered. Without a placeholder rendering waits for
+    the image, with one the placeholder is rendered until the image is ready and the element is invalidated then,
+    so the next render of the document shows the image.
+    """
+
+    _render_state = ("_html", "_digest", "_provided", "_src_uri", "_src_trusted")
+
+    def __init__(
+        self,
+        ctx: ContextBase,
+        src: str,
+        image_type: ImageType = ImageType.PNG,
+        alt: str = "",
+        placeholder: Optional[str] = None,
+    ):
+        super().__init__(ctx, "img")
+        self.src = src
+        self.image_type = image_type
+        self.placeholder = placeholder
+        self._image = images.prefetch(src, image_type, getattr(ctx, "tracer", None))
+        self._src_uri: Optional[str] = None
+        self._src_trusted = False
+        self.set_attribute("alt", alt)
+        if placeholder is not None and not self._image.done():
+            node = weakref.ref(self)
+            self._image.add_done_callback(lambda _: node() is not None and node()._image_ready())  # type: ignore
+
+    def _image_ready(self):
+        # Runs on a loader thread, the element may have been recycled by the pool in the meantime
+        ctx = getattr(self, "ctx", None)
+        if ctx is None:
+            return
+        with ctx._lock:  # type: ignore
+            src_uri = getattr(self, "_src_uri", None)
+            if src_uri is None or src_uri is not getattr(self, "placeholder", None):
+                return
+            self._src_uri = None
+            self._src_trusted = False
+            self._invalidate()
+            root = self._root()
+        request_refresh = getattr(root, "request_refresh", None)
+        if request_refresh is not None:
+            request_refresh()
+
+    def _hash_parts(self) -> Tuple[Any, ...]:
+        # Whether the placeholder is still shown is part of the content, so a document rendered with it is pushed
+        # again once the image is ready. The loader's future is shared, so rebuilt elements agree with old ones.
+        loading = self.placeholder is not None and not self._image.done()
+        return (self.src, self.image_type.name, loading)
+
+    def _resolve_src(self) -> str:
+        if self._src_uri is None:
+            if self.placeholder is not None and not self._image.done():
+                self._src_uri = self.placeholder
+            else:
+                with span(self.ctx, "wait_image", "image", {"src": self.src}):
+                    try:
+                        self._src_uri = self._image.result()
+                        # Data URIs encoded by the loader are base64 and need no escaping
+                        self._src_trusted = self.image_type != ImageType.Base64
+                    except Exception:
+                        # Not a loadable resource, let the renderer resolve the path itself
+                        self._src_uri = self.src
+        return self._src_uri
+
+    def _render_attributes(self) -> Iterable[Tuple[str, str]]:
+        src = self._resolve_src()
+        return [("src", src if self._src_trusted else html.escape(src)), *self._attributes.items()]
+
+
+class Icon(_DeferredImage):
     """
     Represents an image used as an icon on web pages, loaded from a specified source.
     The icon uses an <img> tag and can be of various types defined by the ImageType enum.
@@ -246,23 +481,25 @@ class Icon(tag):
         src (str): The path or URL to the icon image file.
         image_type (ImageType): The format of the image, defaults to PNG.
         alt (str): Alternative text for the image which describes the icon.
+        placeholder (Optional[str]): Source rendered while the icon is still loading, e.g. a tiny data URI.
 
     Styling:
         The icon's background is set to transparent to blend seamlessly with the UI.
     """
 
-    def __init__(self, ctx: ContextBase, src: str, image_type: ImageType = ImageType.PNG, alt: str = ""):
-        super().__init__(ctx, "img")
-        try:
-            image_src = _image_to_base64(src, image_type)
-        except Exception:
-            image_src = src
-        self.set_attribute("src", image_src)
-        self.set_attribute("alt", alt)
+    def __init__(
+        self,
+        ctx: ContextBase,
+        src: str,
+        image_type: ImageType = ImageType.PNG,
+        alt: str = "",
+        placeholder: Optional[str] = None,
+    ):
+        super().__init__(ctx, src, image_type, alt, placeholder)
         self.bg_color("transparent")
 
 
-class Image(tag):
+class Image(_DeferredImage):
     """
     Represents a generic image element (<img>) on a web page, sourced from a given URL or path.
     It supports different image types, which are handled by converting to base64 format if necessary.
@@ -271,17 +508,9 @@ class Image(tag):
         src (str): The source URL or path for the image file.
         image_type (ImageType): The format of the image, typically defaults to PNG.
         alt (str): Alternative text for the image, providing a textual description.
+        placeholder (Optional[str]): Source rendered while the image is still loading.
 
     Notes:
-        The image attempts to convert the source file to base64 format for embedding directly in web pages,
+        The image is loaded and converted to base64 on a thread pool for embedding directly in web pages,
         falling back to the original source if conversion fails.
     """
-
-    def __init__(self, ctx: ContextBase, src: str, image_type: ImageType = ImageType.PNG, alt: str = ""):
-        super().__init__(ctx, "img")
-        try:
-            image_src = _image_to_base64(src, image_type)
-        except Exception:
-            image_src = src
-        self.set_attribute("src", image_src)
-        self.set_attribute("alt", alt)
@@ -1,9 +1,17 @@
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 import mdpopups
 import sublime
 
+from .actions import actions
+from .lazy import Lazy
+from .reconcile import reconcile
+from .renderable import BaseTag
+from .rope import Rope
+from .style import style
+from .stylesheet import StyleSheet
 from .tag import tag
+from .trace import Span, span
 from .types import ContextBase
 
 
@@ -13,31 +21,259 @@ class Vision(tag):
     for the creation of minihtml content
     that can be rendered to a new sheet
     in Sublime Text or return the generated HTML.
+
+    The document can be shown in several sheets at once, e.g. one per window. It is rendered once per change
+    and the same HTML is pushed to every attached sheet that is still open, closed sheets are dropped.
+
+    With reconcile enabled, `reset` keeps the previous tree until the next render, which matches the
+    rebuilt tree against it by key and position and reuses the rendered HTML of every unchanged subtree.
     """
 
-    def __init__(self, ctx: ContextBase):
+    def __init__(self, ctx: ContextBase, reconcile: bool = False):
         super().__init__(ctx, "html")
+        self.reconcile = reconcile
         self.sheet_name: str = ""
-        self.sheet: Optional[sublime.Sheet] = None
+        self._reset_transient()
+
+    def _reset_transient(self):
+        """
+        Set up the state tied to the live document rather than its content: sheets, the last output and render
+        bookkeeping. Snapshots skip exactly the attributes set here and call it again when loading a document.
+        """
+        self.sheets: List[sublime.Sheet] = []
+        self.last_html: str = ""
+        self._merged_key: tuple = ()
+        self._merged_sheet: Optional[StyleSheet] = None
+        self._style_nodes: List[style] = []
+        self._batched_nodes: Dict[type, List[BaseTag]] = {}
+        self._styles_version = -1
+        self._sheet_digest: Optional[bytes] = None
+        self._build_span: Optional[Span] = None
+        self._refresh_pending = False
+        self._previous: Optional[List[BaseTag]] = None
+        self._previous_html: Optional[Union[str, Rope]] = None
+
+    @property
+    def sheet(self) -> Optional[sublime.Sheet]:
+        """The first attached sheet."""
+        return self.sheets[0] if self.sheets else None
+
+    @sheet.setter
+    def sheet(self, value: Optional[sublime.Sheet]):
+        if value is None:
+            self.sheets = []
+        elif value not in self.sheets:
+            self.sheets.insert(0, value)
+
+    def attach_sheet(self, sheet: sublime.Sheet) -> "Vision":
+        """Mirror the document into an existing HTML sheet, which is brought up to date right away."""
+        if sheet not in self.sheets:
+            self.sheets.append(sheet)
+            if self.last_html:
+                mdpopups.update_html_sheet(sheet, self.last_html, md=False)
+        return self
+
+    def detach_sheet(self, sheet: sublime.Sheet) -> "Vision":
+        """Stop updating the sheet, it keeps showing the last pushed HTML."""
+        if sheet in self.sheets:
+            self.sheets.remove(sheet)
+        return self
+
+    def live_sheets(self) -> List[sublime.Sheet]:
+        """Attached sheets that haven't been closed."""
+        return [sheet for sheet in self.sheets if sheet.window() is not None]
+
+    def __enter__(self):
+        # Everything built inside `with vision:` shows up as one build span
+        tracer = getattr(self.ctx, "tracer", None)
+        if tracer is not None:
+            self._build_span = tracer.span("build").__enter__()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+        if self._build_span is not None:
+            self._build_span.__exit__(exc_type, exc_val, exc_tb)
+            self._build_span = None
 
     def reset(self) -> "Vision":
         """
         Resets the Vision object to its initial state. Clearing all the content, including head, body, css, and sheet.
+        When the context has pooling enabled, the discarded nodes are recycled by the next build.
         """
-        self._children = []
+        with self.ctx._lock:  # type: ignore
+            actions.begin_generation(self)
+            if self.reconcile and self._previous is None:
+                self._previous = self._children
+                self._previous_html = self._html
+            else:
+                self._release(self._children)
+            self._children = []
+            self._invalidate()
+            self.ctx.tree_version += 1  # type: ignore
         return self
 
-    def render_to_sheet(self, sheet_name: str):
+    def dispose(self):
+        """
+        Tear the document down: drop the current and previous trees, every cache and the sheet reference.
+        The Vision can be built and rendered again afterwards.
+        """
+        with self.ctx._lock:  # type: ignore
+            self.reset()
+            if self._previous is not None:
+                self._release(self._previous)
+            self._previous = None
+            self._previous_html = None
+            self._style_nodes = []
+            self._batched_nodes = {}
+            self._merged_key = ()
+            self._merged_sheet = None
+            self._sheet_digest = None
+            self.last_html = ""
+            self.sheets = []
+            actions.evict_owner(self)
+
+    def request_refresh(self):
+        """
+        Render the document to its sheets again on the main thread, e.g. after background work updated elements.
+        Requests made before the refresh runs are coalesced into one. Safe to call from any thread.
+        """
+        with self.ctx._lock:  # type: ignore
+            # Render-time state such as highlighting changed while the content digest stayed the same
+            self._sheet_digest = None
+            if self._refresh_pending:
+                return
+            self._refresh_pending = True
+        sublime.set_timeout(self._refresh)
+
+    def _refresh(self):
+        with self.ctx._lock:  # type: ignore
+            self._refresh_pending = False
+            if self.sheet_name and self.live_sheets():
+                self.render_to_sheet(self.sheet_name)
+
+    def _release(self, nodes: List[BaseTag]):
+        pool = getattr(self.ctx, "pool", None)
+        if pool is not None and pool.enabled:
+            for node in nodes:
+                pool.release(node)
+
+    def _reconcile_previous(self):
+        previous, self._previous = self._previous, None
+        if reconcile(previous, self._children) and self._html is None:
+            self._html = self._previous_html
+        self._previous_html = None
+        self._release(previous)
+
+    def _collect_render_nodes(self) -> Tuple[List[style], Dict[type, List[BaseTag]]]:
+        """
+        Find the shown style nodes and the shown elements of classes that prepare their render in batches. Shown
+        `Lazy` subtrees are built on the way, so their elements are found too.
+        """
+        styles = []
+        batched: Dict[type, List[BaseTag]] = {}
+        stack = [iter(self._children)]
+        while stack:
+            for child in stack[-1]:
+                if isinstance(child, style):
+                    styles.append(child)
+                elif isinstance(child, tag) and child._should_render:
+                    if child._batch_render:
+                        batched.setdefault(type(child), []).append(child)
+                    stack.append(iter(child._children))
+                    break
+                elif isinstance(child, Lazy) and child._should_render:
+                    stack.append(iter(child._build()))
+                    break
+            else:
+                stack.pop()
+        return styles, batched
+
+    def _update_render_nodes(self):
+        if self._styles_version != self.ctx.tree_version:  # type: ignore
+            self._style_nodes, self._batched_nodes = self._collect_render_nodes()
+            self._styles_version = self.ctx.tree_version  # type: ignore
+
+    def render(self) -> str:
+        """
+        Render the document, merging every `style` node into a single minified sheet emitted by the first one,
+        unless merging their rules would change which of them applies.
+        Classes that batch work across elements, such as `CodeBlock`, prepare all their elements first.
+        """
+        with self.ctx._lock, span(self.ctx, "render"):  # type: ignore
+            if self._previous is not None:
+                # Build the shown lazy branches first, so they are matched against the previous tree too
+                self._update_render_nodes()
+                with span(self.ctx, "reconcile"):
+                    self._reconcile_previous()
+            actions.evict_stale(self)
+            self._update_render_nodes()
+            for cls, nodes in self._batched_nodes.items():
+                cls.revalidate(nodes)
+                cls.prepare_render(nodes)
+            styles = self._style_nodes
+            emitted: List[Optional[str]] = [None] * len(styles)
+            if len(styles) > 1:
+                key = tuple((id(node.sheet), node.sheet.version) for node in styles)
+                if key != self._merged_key:
+                    self._merged_sheet = StyleSheet.merged(node.sheet for node in styles)
+                    self._merged_key = key
+                if self._merged_sheet is not None:
+                    emitted = [self._merged_sheet.compile()] + [""] * (len(styles) - 1)
+            for node, css in zip(styles, emitted):
+                if node._merged_css != css:
+                    node._merged_css = css
+                    node._invalidate()
+            return super().render()
+
+    def render_to_sheet(self, sheet_name: str, windows: Optional[List[sublime.Window]] = None):
+        """
+        Render the document and push it to every attached sheet. When windows are given, a sheet is opened in
+        each of them that doesn't show the document yet, otherwise one is opened in the active window if no
+        attached sheet is left open.
+        """
         if sheet_name == "":
             raise ValueError("Sheet name cannot be empty")
         # Render the full HTML document to a new sheet
-        self.sheet_name = sheet_name
-        if self.sheet is None or self.sheet.window() is None:
-            self.sheet = mdpopups.new_html_sheet(
-                window=sublime.active_window(),
-                name=self.sheet_name,
-                contents=self.render(),
-                md=False,
-            )
-        else:
-            mdpopups.update_html_sheet(self.sheet, self.render(), md=False)
+        with span(self.ctx, "render_to_sheet", args={"sheet": sheet_name}):
+            self.sheet_name = sheet_name
+            with self.ctx._lock:  # type: ignore
+                self._update_render_nodes()
+                for cls, nodes in self._batched_nodes.items():
+                    cls.revalidate(nodes)
+            with span(self.ctx, "content_digest"):
+                digest = self.content_digest()
+            if digest == self._sheet_digest and self.live_sheets():
+                # Nothing changed since the last push, only windows without the document need a sheet
+                if windows:
+                    self._open_sheets(self.last_html, windows)
+                return
+            self.last_html = self.render()
+            self._sheet_digest = digest
+            self.publish(self.last_html, windows)
+
+    def publish(self, html: str, windows: Optional[List[sublime.Window]] = None):
+        """
+        Show already rendered HTML in every attached sheet that is still open and drop the closed ones. Sheets named
+        `sheet_name` are opened in the given windows that don't show the document yet, or in the active window when
+        no sheet is left.
+        """
+        self.sheets = self.live_sheets()
+        for sheet in self.sheets:
+            with span(self.ctx, "update_html_sheet", "sheet", {"bytes": len(html)}):
+                mdpopups.update_html_sheet(sheet, html, md=False)
+        if windows is None and not self.sheets:
+            windows = [sublime.active_window()]
+        if windows:
+            self._open_sheets(html, windows)
+
+    def _open_sheets(self, html: str, windows: List[sublime.Window]):
+        shown = {sheet.window().id() for sheet in self.live_sheets()}
+        for window in windows:
+            if window is not None and window.id() in shown:
+                continue
+            with span(self.ctx, "new_html_sheet", "sheet"):
+                sheet = mdpopups.new_html_sheet(window=window, name=self.sheet_name, contents=html, md=False)
+            self.sheets.append(sheet)
+            if window is not None:
+                shown.add(window.id())